@@ -7,18 +7,23 @@ load_dotenv()
 
 
 class Config:
-    """Configuration for Chef Intelligence with TinyLlama"""
+    """
+    Configuration for Chef Intelligence with TinyLlama.
+
+    Values are read from the environment once, at import. Importing this module has
+    no other side effects: directories, log handlers and validation happen in
+    setup_logging() / validate(), called once from the app startup.
+    """
 
     # API Configuration
     # ========================
     TINY_LLAMA_API_KEY = os.getenv("TINY_LLAMA_API_KEY")
 
-    if not TINY_LLAMA_API_KEY:
-        raise ValueError("Missing TINY_LLAMA_API_KEY in environment variables. Please check your .env file.")
-
 
     # LLM Configuration
     # ========================
+    # auto: llama_cpp with the INT4 GGUF weights on CPU when available, else transformers
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "auto").lower()  # auto | transformers | vllm | llama_cpp
     LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "TinyLlama/TinyLlama-1.1B-Chat-v1.0")
     LLM_DEVICE = "cuda" if os.getenv("USE_GPU", "false").lower() == "true" else "cpu"
     LLM_MAX_NEW_TOKENS = int(os.getenv("LLM_MAX_NEW_TOKENS", 512))
@@ -26,12 +31,17 @@ class Config:
     LLM_TOP_P = float(os.getenv("LLM_TOP_P", 0.95))
     LLM_TOP_K = int(os.getenv("LLM_TOP_K", 50))
     LLM_DO_SAMPLE = os.getenv("LLM_DO_SAMPLE", "true").lower() == "true"
+    # Weight dtype for the transformers backend: auto (fp16 on GPU/MPS, fp32 on CPU) | float32 | float16 | bfloat16
+    LLM_DTYPE = os.getenv("LLM_DTYPE", "auto").lower()
+    LLM_TORCH_COMPILE = os.getenv("LLM_TORCH_COMPILE", "true").lower() == "true"
+
 
-  
     # Model Loading
     # ========================
     LOAD_IN_8BIT = os.getenv("LOAD_IN_8BIT", "false").lower() == "true"
     LOAD_IN_4BIT = os.getenv("LOAD_IN_4BIT", "false").lower() == "true"
+    # Pre-quantized INT4 (Q4_K_M) GGUF weights for the llama_cpp backend
+    LLM_GGUF_PATH = os.getenv("LLM_GGUF_PATH", "models/tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf")
 
 
     # BM25 Configuration (Method 1)
@@ -39,6 +49,8 @@ class Config:
     BM25_K1 = float(os.getenv("BM25_K1", 1.5))
     BM25_B = float(os.getenv("BM25_B", 0.75))
     TOP_K_RETRIEVAL = int(os.getenv("TOP_K_RETRIEVAL", 3))
+    BM25_BACKEND = os.getenv("BM25_BACKEND", "native").lower()  # native | bm25s
+    BM25S_SCORING_BACKEND = os.getenv("BM25S_SCORING_BACKEND", "auto").lower()  # auto | numba | numpy
 
 
     # Chunking Configuration
@@ -47,25 +59,30 @@ class Config:
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 50))
 
 
+    # Embedding Configuration
+    # ========================
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 128))
+    QDRANT_UPLOAD_PARALLEL = int(os.getenv("QDRANT_UPLOAD_PARALLEL", 4))
+    QDRANT_UPLOAD_RETRIES = int(os.getenv("QDRANT_UPLOAD_RETRIES", 3))
+
+
     # Data Paths
     # ========================
     RAW_RECIPES_PATH = os.getenv("RAW_RECIPES_PATH", "data/raw_recipes/recipes.txt")
     PROCESSED_CHUNKS_PATH = os.getenv("PROCESSED_CHUNKS_PATH", "data/processed_chunks")
     LOGS_PATH = os.getenv("LOGS_PATH", "data/logs")
-    
+
     # Model cache directory - uses environment variable for Docker compatibility
-    MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", 
-                                 os.getenv("TRANSFORMERS_CACHE", "models/cache"))
+    MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR",
+                                     os.getenv("TRANSFORMERS_CACHE", "models/cache"))
 
-    # Ensure cache directory exists
-    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
 
-    
     # Server Configuration
     # ========================
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", 8000))
     DEBUG = os.getenv("DEBUG", "true").lower() == "true"
+    WORKERS = int(os.getenv("WORKERS", 1))
 
 
     # Logging Configuration
@@ -74,36 +91,45 @@ class Config:
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
     LOG_FILE_PATH = os.getenv("LOG_FILE_PATH", "data/logs/app.log")
 
-    os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
+    @classmethod
+    def validate(cls) -> None:
+        """Fail fast on missing required settings"""
+        if not cls.TINY_LLAMA_API_KEY:
+            raise ValueError("Missing TINY_LLAMA_API_KEY in environment variables. Please check your .env file.")
 
-    logger = logging.getLogger(LOGGER_NAME)
-    logger.setLevel(LOG_LEVEL)
+    @classmethod
+    def setup_logging(cls) -> logging.Logger:
+        """Create data/model directories and attach the app logger's handlers (idempotent)"""
+        os.makedirs(cls.MODEL_CACHE_DIR, exist_ok=True)
+        os.makedirs(os.path.dirname(cls.LOG_FILE_PATH), exist_ok=True)
 
-    # File Handler
-    file_handler = logging.FileHandler(LOG_FILE_PATH)
-    file_handler.setLevel(LOG_LEVEL)
+        logger = logging.getLogger(cls.LOGGER_NAME)
+        logger.setLevel(cls.LOG_LEVEL)
 
-    # Console Handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(LOG_LEVEL)
+        # Prevent duplicate handlers
+        if logger.handlers:
+            return logger
 
-    # Log Format
-    formatter = logging.Formatter(
-        "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-    )
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
+        # File Handler
+        file_handler = logging.FileHandler(cls.LOG_FILE_PATH)
+        file_handler.setLevel(cls.LOG_LEVEL)
 
-    # Prevent duplicate handlers
-    if not logger.handlers:
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+        # Console Handler
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(cls.LOG_LEVEL)
 
-    logger.info("✅ Chef Intelligence Configuration Loaded Successfully")
-    logger.info(f"Model: {LLM_MODEL_NAME} | Device: {LLM_DEVICE}")
-    logger.info(f"Model Cache: {MODEL_CACHE_DIR}")
-    logger.info(f"Server: {HOST}:{PORT}")
+        # Log Format
+        formatter = logging.Formatter(
+            "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+        )
+        file_handler.setFormatter(formatter)
+        console_handler.setFormatter(formatter)
 
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
 
-# Export a config instance for imports
-config = Config()
\ No newline at end of file
+        logger.info("✅ Chef Intelligence Configuration Loaded Successfully")
+        logger.info("Model: %s | Device: %s", cls.LLM_MODEL_NAME, cls.LLM_DEVICE)
+        logger.info("Model Cache: %s", cls.MODEL_CACHE_DIR)
+        logger.info("Server: %s:%s", cls.HOST, cls.PORT)
+        return logger
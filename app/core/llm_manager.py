@@ -1,5 +1,8 @@
+import gc
 import os
+import re
 import platform
+import importlib.util
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
 from typing import List
@@ -10,6 +13,10 @@ from openai import OpenAI
 
 logger = setup_logger(__name__)
 
+def format_zephyr_prompt(system_prompt: str, user_prompt: str) -> str:
+    """Format prompts in TinyLlama (Zephyr) chat format, shared by all local backends"""
+    return f"<|system|> {system_prompt}</s> <|user|> {user_prompt}</s> <|assistant|> "
+
 class TinyLlamaManager:
     """
     TinyLlama Manager for generating responses.
@@ -35,8 +42,16 @@ class TinyLlamaManager:
         self.top_p = Config.LLM_TOP_P
         self.top_k = Config.LLM_TOP_K
         self.do_sample = Config.LLM_DO_SAMPLE
+        self.max_input_tokens = 2048
+        # Weight format actually in use, reported by /model/info
+        self.quantization = "none"
+
+        # Token ids of the (near-constant) system segment, keyed by system prompt
+        self._system_prefix_cache = {}
+        # Whether cached prefix + user segment ids match the full prompt (None until checked)
+        self._split_encoding_ok = None
 
-        logger.info(f"Initializing TinyLlama Manager (model={self.model_name}, device={self.device}, OS={platform.system()})")
+        logger.info("Initializing TinyLlama Manager (model=%s, device=%s, OS=%s)", self.model_name, self.device, platform.system())
 
         # Create cache directory
         os.makedirs(Config.MODEL_CACHE_DIR, exist_ok=True)
@@ -60,8 +75,11 @@ class TinyLlamaManager:
 
             logger.info("Loading TinyLlama model...")
 
-            # Determine dtype
-            torch_dtype = torch.float16 if self.device in ["cuda", "mps"] else torch.float32
+            # Determine dtype (LLM_DTYPE overrides the device default, e.g. bfloat16 on bf16-capable CPUs)
+            if Config.LLM_DTYPE != "auto":
+                torch_dtype = getattr(torch, Config.LLM_DTYPE)
+            else:
+                torch_dtype = torch.float16 if self.device in ["cuda", "mps"] else torch.float32
 
             # Load model with quantization only on CUDA
             if (Config.LOAD_IN_8BIT or Config.LOAD_IN_4BIT) and self.device == "cuda":
@@ -76,6 +94,7 @@ class TinyLlamaManager:
                     device_map="auto",
                     trust_remote_code=True
                 )
+                self.quantization = "bnb-int8" if Config.LOAD_IN_8BIT else "bnb-int4"
             else:
                 self.model = AutoModelForCausalLM.from_pretrained(
                     self.model_name,
@@ -87,38 +106,120 @@ class TinyLlamaManager:
                 self.model.to(self.device)
 
             self.model.eval()
-            logger.info(f"✓ TinyLlama model loaded successfully on {self.device}")
+
+            # bitsandbytes only covers CUDA; on CPU use dynamic INT8 quantization of the Linear layers
+            if Config.LOAD_IN_8BIT and self.device == "cpu":
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+                self.quantization = "int8-dynamic"
+                logger.info("Applied dynamic INT8 quantization to Linear layers (CPU)")
+            elif Config.LOAD_IN_8BIT and self.device == "mps":
+                logger.info("Quantization is not supported on MPS; using float16 weights")
+            if self.quantization == "none":
+                self.quantization = str(torch_dtype).replace("torch.", "")
+            logger.info("✓ TinyLlama model loaded successfully on %s (%s)", self.device, self.quantization)
+
+            self._compile_model()
+            self._warmup()
 
         except Exception as e:
-            logger.error(f"Error loading TinyLlama model: {str(e)}")
+            logger.error("Error loading TinyLlama model: %s", e)
             raise
 
-    def _format_chat_prompt(self, system_prompt: str, user_prompt: str) -> str:
-        """Format prompts in TinyLlama chat format"""
-        return f"<|system|> {system_prompt}</s> <|user|> {user_prompt}</s> <|assistant|> "
+    def _compile_model(self):
+        """Compile the forward pass with torch.compile (PyTorch >= 2.1, not on MPS)"""
+        major, minor = (int(v) for v in torch.__version__.split(".")[:2])
+        if not Config.LLM_TORCH_COMPILE or self.device == "mps" or (major, minor) < (2, 1):
+            return
+
+        if self.device == "cuda":
+            # TF32 matmuls on Ampere+ GPUs
+            torch.set_float32_matmul_precision("high")
+
+        # Compile forward (not the module) so HF generate() goes through the compiled graph.
+        # The KV cache grows every decode step: dynamic shapes avoid a recompile (and, under
+        # CUDA graphs, a re-capture) per sequence length.
+        self._eager_forward = self.model.forward
+        self.model.forward = torch.compile(self.model.forward, mode="default", dynamic=True, fullgraph=False)
+        logger.info("TinyLlama forward pass wrapped with torch.compile")
+
+    def _warmup(self):
+        """Run a short generation to trigger compilation and fill the allocator / kernel caches"""
+        try:
+            inputs = self.tokenizer(
+                format_zephyr_prompt("You are a helpful assistant.", "Hello"),
+                return_tensors="pt"
+            ).to(self.device)
+            with torch.no_grad():
+                self.model.generate(
+                    **inputs,
+                    max_new_tokens=16,
+                    do_sample=False,
+                    use_cache=True,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    eos_token_id=self.tokenizer.eos_token_id
+                )
+            logger.info("TinyLlama warmup complete")
+        except Exception as e:
+            logger.warning("TinyLlama warmup failed, falling back to eager mode: %s", e)
+            if hasattr(self, "_eager_forward"):
+                self.model.forward = self._eager_forward
+
+    def _encode_prompt(self, system_prompt: str, user_prompt: str) -> torch.Tensor:
+        """
+        Tokenize the chat prompt, reusing cached token ids for the system segment.
+        Yields the same ids as tokenizing format_zephyr_prompt(), truncated to max_input_tokens.
+        """
+        full_prompt = format_zephyr_prompt(system_prompt, user_prompt)
+
+        # Checked once: some tokenizers normalize a segment start differently from the
+        # same text mid-prompt, in which case the split encoding is not used
+        if self._split_encoding_ok is False:
+            input_ids = self.tokenizer(full_prompt)["input_ids"]
+            return torch.tensor([input_ids[:self.max_input_tokens]], device=self.device)
+
+        prefix_ids = self._system_prefix_cache.get(system_prompt)
+        if prefix_ids is None:
+            prefix_ids = self.tokenizer(f"<|system|> {system_prompt}</s>")["input_ids"]
+            if len(self._system_prefix_cache) >= 8:
+                self._system_prefix_cache.clear()
+            self._system_prefix_cache[system_prompt] = prefix_ids
+
+        # User segment keeps its real leading separator after </s>
+        user_ids = self.tokenizer(
+            f" <|user|> {user_prompt}</s> <|assistant|> ",
+            add_special_tokens=False
+        )["input_ids"]
+        input_ids = prefix_ids + user_ids
+
+        if self._split_encoding_ok is None:
+            full_ids = self.tokenizer(full_prompt)["input_ids"]
+            self._split_encoding_ok = input_ids == full_ids
+            if not self._split_encoding_ok:
+                logger.info("Split prompt encoding differs from the full prompt; tokenizing full prompts")
+                self._system_prefix_cache.clear()
+                input_ids = full_ids
+
+        return torch.tensor([input_ids[:self.max_input_tokens]], device=self.device)
 
     def generate_response(self, query: str, context_chunks: List[str]) -> str:
         """Generate response using TinyLlama"""
         try:
             system_prompt, user_prompt = self.prompt_builder.build_base_prompt(query, context_chunks)
-            formatted_prompt = self._format_chat_prompt(system_prompt, user_prompt)
 
-            inputs = self.tokenizer(
-                formatted_prompt,
-                return_tensors="pt",
-                truncation=True,
-                max_length=2048,
-                padding=True
-            ).to(self.device)
+            # Single prompt: no padding, so every token the model attends to is real
+            input_ids = self._encode_prompt(system_prompt, user_prompt)
+            attention_mask = torch.ones_like(input_ids)
 
             with torch.no_grad():
                 outputs = self.model.generate(
-                    **inputs,
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
                     max_new_tokens=self.max_new_tokens,
                     temperature=self.temperature,
                     top_p=self.top_p,
                     top_k=self.top_k,
                     do_sample=self.do_sample,
+                    use_cache=True,
                     pad_token_id=self.tokenizer.pad_token_id,
                     eos_token_id=self.tokenizer.eos_token_id
                 )
@@ -130,7 +231,7 @@ class TinyLlamaManager:
             return answer
 
         except Exception as e:
-            logger.error(f"Error generating TinyLlama response: {str(e)}")
+            logger.error("Error generating TinyLlama response: %s", e)
             return f"Error generating response: {str(e)}"
 
     def cleanup(self):
@@ -139,10 +240,131 @@ class TinyLlamaManager:
             del self.model
         if hasattr(self, 'tokenizer'):
             del self.tokenizer
-        if torch.cuda.is_available() or self.device == "mps":
+        # Release freed tensors before returning cached device memory
+        gc.collect()
+        if self.device == "cuda":
             torch.cuda.empty_cache()
+        elif self.device == "mps":
+            torch.mps.empty_cache()
         logger.info("TinyLlama model cleaned up from memory")
 
+class VLLMManager:
+    """
+    vLLM Manager for TinyLlama on GPU.
+    Same interface as TinyLlamaManager; vLLM adds continuous batching and a paged KV cache.
+    """
+
+    def __init__(self):
+        """Initialize vLLM Manager"""
+        from vllm import LLM, SamplingParams
+
+        self.model_name = Config.LLM_MODEL_NAME
+        self.prompt_builder = PromptBuilder()
+        self.device = "cuda"
+        self.quantization = "float16"
+
+        self.max_new_tokens = Config.LLM_MAX_NEW_TOKENS
+        self.sampling_params = SamplingParams(
+            max_tokens=self.max_new_tokens,
+            temperature=Config.LLM_TEMPERATURE if Config.LLM_DO_SAMPLE else 0.0,
+            top_p=Config.LLM_TOP_P,
+            top_k=Config.LLM_TOP_K,
+        )
+
+        logger.info("Initializing vLLM Manager (model=%s, device=%s)", self.model_name, self.device)
+        self.llm = LLM(
+            model=self.model_name,
+            dtype="float16",
+            max_model_len=2048,
+            download_dir=Config.MODEL_CACHE_DIR
+        )
+        logger.info("✓ vLLM engine loaded successfully")
+
+    def generate_response(self, query: str, context_chunks: List[str]) -> str:
+        """Generate response using vLLM"""
+        try:
+            system_prompt, user_prompt = self.prompt_builder.build_base_prompt(query, context_chunks)
+            formatted_prompt = format_zephyr_prompt(system_prompt, user_prompt)
+
+            outputs = self.llm.generate([formatted_prompt], self.sampling_params, use_tqdm=False)
+            answer = outputs[0].outputs[0].text.strip()
+
+            logger.info("vLLM response generated successfully")
+            return answer
+
+        except Exception as e:
+            logger.error("Error generating vLLM response: %s", e)
+            return f"Error generating response: {str(e)}"
+
+    def cleanup(self):
+        """Clean up engine from memory"""
+        if hasattr(self, 'llm'):
+            del self.llm
+        logger.info("vLLM engine cleaned up from memory")
+
+class LlamaCppManager:
+    """
+    llama.cpp Manager for CPU-only deploys.
+    Runs a pre-quantized GGUF TinyLlama (e.g. Q4_K_M) with the same interface as TinyLlamaManager.
+    """
+
+    def __init__(self):
+        """Initialize llama.cpp Manager"""
+        from llama_cpp import Llama
+
+        self.model_path = Config.LLM_GGUF_PATH
+        self.prompt_builder = PromptBuilder()
+        self.device = "cpu"
+        # GGUF quant type from the conventional file name suffix, e.g. "...Q4_K_M.gguf"
+        quant_type = re.search(r"[.-]((?:I?Q\d\w*)|B?F16|F32)\.gguf$", os.path.basename(self.model_path), re.IGNORECASE)
+        self.quantization = f"gguf-{quant_type.group(1).lower()}" if quant_type else "gguf"
+
+        self.max_new_tokens = Config.LLM_MAX_NEW_TOKENS
+        self.temperature = Config.LLM_TEMPERATURE if Config.LLM_DO_SAMPLE else 0.0
+        self.top_p = Config.LLM_TOP_P
+        self.top_k = Config.LLM_TOP_K
+
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"GGUF model not found: {self.model_path}. Set LLM_GGUF_PATH.")
+
+        logger.info("Initializing llama.cpp Manager (model=%s, format=%s, threads=%s)", self.model_path, self.quantization, os.cpu_count())
+        self.llm = Llama(
+            model_path=self.model_path,
+            n_ctx=2048,
+            n_threads=os.cpu_count(),
+            verbose=False
+        )
+        logger.info("✓ llama.cpp model loaded successfully")
+
+    def generate_response(self, query: str, context_chunks: List[str]) -> str:
+        """Generate response using llama.cpp"""
+        try:
+            system_prompt, user_prompt = self.prompt_builder.build_base_prompt(query, context_chunks)
+            formatted_prompt = format_zephyr_prompt(system_prompt, user_prompt)
+
+            output = self.llm(
+                formatted_prompt,
+                max_tokens=self.max_new_tokens,
+                temperature=self.temperature,
+                top_p=self.top_p,
+                top_k=self.top_k,
+                stop=["</s>"]
+            )
+            answer = output["choices"][0]["text"].strip()
+
+            logger.info("llama.cpp response generated successfully")
+            return answer
+
+        except Exception as e:
+            logger.error("Error generating llama.cpp response: %s", e)
+            return f"Error generating response: {str(e)}"
+
+    def cleanup(self):
+        """Clean up model from memory"""
+        if hasattr(self, 'llm'):
+            del self.llm
+        logger.info("llama.cpp model cleaned up from memory")
+
 class OpenAIManager:
     """
     OpenAI Manager for GPT-based models (default: gpt-4o-mini).
@@ -166,7 +388,7 @@ class OpenAIManager:
         self.temperature = getattr(Config, "OPENAI_TEMPERATURE", 0.7)
         self.top_p = getattr(Config, "OPENAI_TOP_P", 1.0)
 
-        logger.info(f"Initializing OpenAI Manager (model={self.model_name}, OS={platform.system()})")
+        logger.info("Initializing OpenAI Manager (model=%s, OS=%s)", self.model_name, platform.system())
 
     def _format_chat_prompt(self, system_prompt: str, user_prompt: str):
         """Format prompt for GPT chat models"""
@@ -194,16 +416,41 @@ class OpenAIManager:
             return answer
 
         except Exception as e:
-            logger.error(f"Error generating OpenAI response: {str(e)}")
+            logger.error("Error generating OpenAI response: %s", e)
             return f"Error generating response: {str(e)}"
 
 
+# Local generation backends, selected via Config.LLM_BACKEND
+LLM_BACKENDS = {
+    "transformers": TinyLlamaManager,
+    "vllm": VLLMManager,
+    "llama_cpp": LlamaCppManager,
+}
+
 # Singleton instance
 _llm_manager_instance = None
 
+def resolve_llm_backend() -> str:
+    """
+    Resolve Config.LLM_BACKEND, mapping "auto" to llama_cpp (INT4 GGUF) on CPU
+    when llama-cpp-python and the GGUF weights are available, else transformers.
+    """
+    if Config.LLM_BACKEND != "auto":
+        return Config.LLM_BACKEND
+    if (
+        Config.LLM_DEVICE == "cpu"
+        and os.path.exists(Config.LLM_GGUF_PATH)
+        and importlib.util.find_spec("llama_cpp") is not None
+    ):
+        return "llama_cpp"
+    return "transformers"
+
 def get_llm_manager():
     """Get or create LLM manager singleton"""
     global _llm_manager_instance
     if _llm_manager_instance is None:
-        _llm_manager_instance = TinyLlamaManager()
+        backend = resolve_llm_backend()
+        if backend not in LLM_BACKENDS:
+            raise ValueError(f"Unknown LLM_BACKEND '{backend}'. Choose from: auto, {', '.join(LLM_BACKENDS)}")
+        _llm_manager_instance = LLM_BACKENDS[backend]()
     return _llm_manager_instance
@@ -1,36 +1,61 @@
 import re
-import math
-from typing import List, Tuple
-from collections import Counter
+import os
+import json
+import shutil
+import hashlib
+from typing import List, Optional, Tuple
+import numpy as np
+from scipy import sparse
 # from app.utils.logger import setup_logger
 from app.config import Config
 
 # logger = setup_logger(__name__)
 
+# Compiled once; equivalent to r'\b\w+\b' since \w+ runs are always word-bounded.
+# google-re2 (linear-time DFA) is used when installed; its \w is ASCII-only, so the
+# Unicode classes spell out Python's \w (letters, digits, underscore)
+try:
+    import re2
+    _TOKEN_RE = re2.compile(r"[\p{L}\p{N}_]+")
+    _TOKENIZER = "re2"
+except ImportError:
+    _TOKEN_RE = re.compile(r"\w+")
+    _TOKENIZER = "re"
+
+# Bump whenever the on-disk index layout changes so stale caches are ignored
+_INDEX_VERSION = 4
+
 class BM25Retriever:
     """
     BM25 (Best Match 25) keyword-based retrieval algorithm
     Method 1: Direct keyword search without vector embeddings
     """
 
-    def __init__(self, k1: float = None, b: float = None):
+    def __init__(self, k1: float = None, b: float = None, cache_dir: Optional[str] = None):
         """
         Initialize BM25 retriever
         
         Args:
             k1: Term frequency saturation parameter
             b: Length normalization parameter
+            cache_dir: Directory for the persistent index cache (disabled if None)
         """
         self.k1 = k1 or Config.BM25_K1
         self.b = b or Config.BM25_B
+        self.cache_dir = cache_dir
         self.documents = []
-        self.doc_lengths = []
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
         self.avg_doc_length = 0
-        self.doc_freqs = {}
-        self.idf = {}
-        self.tokenized_docs = []
+        self.doc_freqs = np.zeros(0, dtype=np.int64)
+        self.token2id = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+        # Per-term upper bound on a single document's BM25 contribution (for MaxScore pruning)
+        self.max_score = np.zeros(0, dtype=np.float32)
+        # Precomputed BM25(t, d) scores as Structure-of-Arrays (CSC, rows = documents, cols = vocabulary ids):
+        # term t's doc ids are postings.indices[indptr[t]:indptr[t+1]], its scores the same slice of .data
+        self.postings = sparse.csc_matrix((0, 0), dtype=np.float32)
 
-        # logger.info(f"BM25 Retriever initialized (k1={self.k1}, b={self.b})")
+        # logger.info("BM25 Retriever initialized (k1=%s, b=%s)", self.k1, self.b)
 
     def tokenize(self, text: str) -> List[str]:
         """
@@ -42,9 +67,7 @@ class BM25Retriever:
         Returns:
             List of tokens
         """
-        text = text.lower()
-        tokens = re.findall(r'\b\w+\b', text)
-        return tokens
+        return _TOKEN_RE.findall(text.lower())
 
     def index_documents(self, documents: List[str]):
         """
@@ -53,27 +76,268 @@ class BM25Retriever:
         Args:
             documents: List of document strings
         """
-        # logger.info(f"Indexing {len(documents)} documents...")
+        # logger.info("Indexing %s documents...", len(documents))
         
         self.documents = documents
-        self.tokenized_docs = [self.tokenize(doc) for doc in documents]
-        self.doc_lengths = [len(doc) for doc in self.tokenized_docs]
-        self.avg_doc_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0
-
-        # Calculate document frequencies
-        self.doc_freqs = {}
-        for tokenized_doc in self.tokenized_docs:
-            unique_tokens = set(tokenized_doc)
-            for token in unique_tokens:
-                self.doc_freqs[token] = self.doc_freqs.get(token, 0) + 1
-        
-        # Calculate IDF (Inverse Document Frequency)
+
+        cache_path = self._cache_path(documents) if self.cache_dir else None
+        if cache_path and self._load_index(cache_path):
+            return
+
+        tokenized_docs = [self.tokenize(doc) for doc in documents]
+
+        # Build vocabulary and a CSR (per-document) term-frequency matrix in one pass
+        self.token2id = {}
+        indptr = [0]
+        indices = []
+        data = []
+        for tokenized_doc in tokenized_docs:
+            doc_counts = {}
+            for token in tokenized_doc:
+                token_id = self.token2id.setdefault(token, len(self.token2id))
+                doc_counts[token_id] = doc_counts.get(token_id, 0) + 1
+            indices.extend(doc_counts.keys())
+            data.extend(doc_counts.values())
+            indptr.append(len(indices))
+
+        term_freqs = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(documents), len(self.token2id)),
+        )
+        # Transpose the layout into contiguous per-term posting arrays
+        self.postings = term_freqs.tocsc()
+        self.doc_lengths = np.asarray([len(doc) for doc in tokenized_docs], dtype=np.float32)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0
+
+        # Calculate document frequencies: posting list length per term
         num_docs = len(self.documents)
-        self.idf = {}
-        for token, freq in self.doc_freqs.items():
-            self.idf[token] = math.log((num_docs - freq + 0.5) / (freq + 0.5) + 1.0)
-        
-        # logger.info(f"Indexing complete. Unique tokens: {len(self.idf)}")
+        self.doc_freqs = np.diff(self.postings.indptr)
+
+        # Calculate IDF (Inverse Document Frequency), aligned to vocabulary ids
+        self.idf = np.log((num_docs - self.doc_freqs + 0.5) / (self.doc_freqs + 0.5) + 1.0).astype(np.float32)
+
+        # The corpus is static: turn term frequencies into final BM25 scores once,
+        # so serving a query is a sparse lookup-and-add with no per-request arithmetic
+        self.postings.data = self._bm25_weights()
+        self.max_score = self._term_max_scores()
+
+        if cache_path:
+            self._save_index(cache_path)
+
+        # logger.info("Indexing complete. Unique tokens: %s", len(self.idf))
+
+    def _bm25_weights(self) -> np.ndarray:
+        """BM25(t, d) for every posting, from the term frequencies in postings.data"""
+        tf = self.postings.data
+        if not self.postings.nnz:
+            return tf
+        term_ids = np.repeat(np.arange(self.postings.shape[1]), np.diff(self.postings.indptr))
+        # Per-document length normalization: k1 * (1 - b + b * dl / avgdl)
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / self.avg_doc_length)
+        weights = self.idf[term_ids] * (tf * (self.k1 + 1) / (tf + length_norm[self.postings.indices]))
+        return weights.astype(np.float32)
+
+    def _term_max_scores(self) -> np.ndarray:
+        """Exact per-term maximum of the BM25 contribution over that term's posting list"""
+        if not self.postings.nnz:
+            return np.zeros(self.postings.shape[1], dtype=np.float32)
+        # Every vocabulary term has at least one posting, so no reduceat segment is empty
+        return np.maximum.reduceat(self.postings.data, self.postings.indptr[:-1])
+
+    @property
+    def vocab_size(self) -> int:
+        """Number of distinct indexed tokens"""
+        return len(self.token2id)
+
+    def _cache_path(self, documents: List[str]) -> str:
+        """Cache location keyed by a hash of the corpus, BM25 parameters, tokenizer and index layout"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"v{_INDEX_VERSION}|tok={_TOKENIZER}|k1={self.k1}|b={self.b}|n={len(documents)}".encode("utf-8"))
+        for doc in documents:
+            digest.update(doc.encode("utf-8"))
+            digest.update(b"\0")
+        return os.path.join(self.cache_dir, f"bm25_{digest.hexdigest()}")
+
+    def _save_index(self, cache_path: str):
+        """Persist the index arrays as .npy files so they can be memory-mapped on load"""
+        tmp_path = f"{cache_path}.tmp{os.getpid()}"
+        os.makedirs(tmp_path, exist_ok=True)
+        np.save(os.path.join(tmp_path, "score_data.npy"), self.postings.data)
+        np.save(os.path.join(tmp_path, "tf_indices.npy"), self.postings.indices)
+        np.save(os.path.join(tmp_path, "tf_indptr.npy"), self.postings.indptr)
+        np.save(os.path.join(tmp_path, "doc_lengths.npy"), self.doc_lengths)
+        np.save(os.path.join(tmp_path, "doc_freqs.npy"), self.doc_freqs)
+        np.save(os.path.join(tmp_path, "idf.npy"), self.idf)
+        np.save(os.path.join(tmp_path, "max_score.npy"), self.max_score)
+        # Vocabulary in id order
+        with open(os.path.join(tmp_path, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(list(self.token2id), f, ensure_ascii=False)
+
+        # Publish atomically; another process may have written the same index meanwhile
+        try:
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+        self._evict_stale(cache_path)
+
+    def _evict_stale(self, cache_path: str):
+        """Remove cached indexes of other corpora (in-progress .tmp writes are left alone)"""
+        current = os.path.basename(cache_path)
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if (entry.name.startswith("bm25_") and entry.name != current
+                        and ".tmp" not in entry.name and entry.is_dir(follow_symlinks=False)):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _load_index(self, cache_path: str) -> bool:
+        """Load a cached index with memory-mapped arrays; returns False on a cache miss"""
+        if not os.path.isdir(cache_path):
+            return False
+        try:
+            def load(name):
+                return np.load(os.path.join(cache_path, f"{name}.npy"), mmap_mode="r")
+
+            with open(os.path.join(cache_path, "vocab.json"), "r", encoding="utf-8") as f:
+                vocab = json.load(f)
+            self.token2id = {token: token_id for token_id, token in enumerate(vocab)}
+            self.postings = sparse.csc_matrix(
+                (load("score_data"), load("tf_indices"), load("tf_indptr")),
+                shape=(len(self.documents), len(vocab)),
+                copy=False,
+            )
+            self.doc_lengths = load("doc_lengths")
+            self.avg_doc_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0
+            self.doc_freqs = load("doc_freqs")
+            self.idf = load("idf")
+            self.max_score = load("max_score")
+            if len(self.doc_lengths) != len(self.documents):
+                raise ValueError("cached index does not match the corpus")
+        except (OSError, ValueError):
+            # Partial or corrupt cache: drop it so the rebuilt index can take its place
+            shutil.rmtree(cache_path, ignore_errors=True)
+            return False
+        return True
+
+    def _query_columns(self, query_tokens: List[str]) -> np.ndarray:
+        """Map query tokens to vocabulary ids, dropping unknown tokens"""
+        return np.asarray(
+            [self.token2id[token] for token in query_tokens if token in self.token2id],
+            dtype=np.int64,
+        )
+
+    def score_documents(self, query_tokens: List[str], top_k: Optional[int] = None) -> np.ndarray:
+        """
+        Calculate BM25 scores for all documents at once
+
+        With top_k set, MaxScore pruning scores the low-impact terms only for
+        documents that can still reach the top-k: other documents keep partial
+        scores (still below the k-th score), while the top-k scores are exact.
+
+        Args:
+            query_tokens: List of query tokens
+            top_k: Number of results the caller will select (None scores exhaustively)
+
+        Returns:
+            Array of BM25 scores, one per document
+        """
+        num_docs = len(self.documents)
+        scores = np.zeros(num_docs, dtype=np.float32)
+        if not self.avg_doc_length:
+            return scores
+
+        token_ids = self._query_columns(query_tokens)
+        if top_k is None or top_k <= 0 or top_k >= num_docs or len(token_ids) < 2:
+            # Term-at-a-time: work is proportional to the query terms' posting lengths
+            for token_id in token_ids:
+                self._score_term(token_id, scores)
+            return scores
+
+        # MaxScore: highest-impact terms first; remaining[i] bounds what terms i.. can still add
+        token_ids = token_ids[np.argsort(-self.max_score[token_ids], kind="stable")]
+        remaining = np.cumsum(self.max_score[token_ids][::-1])[::-1]
+        # Sorted, unique ids of every document scored so far; all others are still at zero
+        touched = np.zeros(0, dtype=self.postings.indices.dtype)
+        for i, token_id in enumerate(token_ids):
+            if i > 0 and self._kth_score(scores, touched, top_k) > remaining[i]:
+                break
+            touched = np.union1d(touched, self._score_term(token_id, scores))
+        else:
+            return scores
+
+        # Essential terms are done: the remaining ones can't lift an untouched document to
+        # the k-th score, so they are only looked up for documents within reach of it.
+        # The k-th score over a subset never exceeds the true one, so pruning stays safe.
+        candidates = touched
+        for j in range(i, len(token_ids)):
+            threshold = self._kth_score(scores, candidates, top_k)
+            candidates = candidates[scores[candidates] + remaining[j] >= threshold]
+            self._score_term(token_ids[j], scores, candidates)
+        return scores
+
+    @staticmethod
+    def _kth_score(scores: np.ndarray, doc_ids: np.ndarray, top_k: int) -> float:
+        """k-th largest score among doc_ids (0 when there are fewer than k of them)"""
+        if len(doc_ids) < top_k:
+            return 0.0
+        subset = scores[doc_ids]
+        return float(np.partition(subset, len(subset) - top_k)[len(subset) - top_k])
+
+    def _score_term(self, token_id: int, scores: np.ndarray, candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Accumulate one term's BM25 contribution into scores, in place
+
+        Args:
+            token_id: Vocabulary id of the query term
+            scores: Per-document score accumulator
+            candidates: Optional sorted document ids restricting which documents are updated
+
+        Returns:
+            Ids of the documents that were updated
+        """
+        start, end = self.postings.indptr[token_id], self.postings.indptr[token_id + 1]
+        doc_ids = self.postings.indices[start:end]
+        term_scores = self.postings.data[start:end]
+        if candidates is not None:
+            # Binary-search the candidates in the (sorted) posting list instead of reading all of it
+            pos = np.searchsorted(doc_ids, candidates)
+            found = pos < len(doc_ids)
+            found[found] = doc_ids[pos[found]] == candidates[found]
+            pos = pos[found]
+            doc_ids, term_scores = doc_ids[pos], term_scores[pos]
+
+        # Precomputed BM25 scores: a gather-add over the posting list (doc ids are unique within a term)
+        scores[doc_ids] += term_scores
+        return doc_ids
+
+    @staticmethod
+    def select_top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+        """
+        Select indices of the top-k scores in O(N) instead of a full sort
+
+        Ties are broken by lower document index, matching a stable
+        descending sort of the whole score array.
+
+        Args:
+            scores: Array of document scores
+            top_k: Number of indices to select
+
+        Returns:
+            Indices of the top-k scores, best first
+        """
+        num_docs = len(scores)
+        top_k = min(top_k, num_docs)
+        if top_k <= 0:
+            return np.zeros(0, dtype=np.int64)
+
+        # k-th largest score via linear-time partition
+        kth_score = np.partition(scores, num_docs - top_k)[num_docs - top_k]
+        above = np.flatnonzero(scores > kth_score)
+        ties = np.flatnonzero(scores == kth_score)[:top_k - len(above)]
+        top_idx = np.concatenate([above, ties])
+
+        # Only the k winners are sorted
+        return top_idx[np.argsort(-scores[top_idx], kind="stable")]
 
     def calculate_bm25_score(self, query_tokens: List[str], doc_idx: int) -> float:
         """
@@ -86,27 +350,17 @@ class BM25Retriever:
         Returns:
             BM25 score
         """
-        score = 0.0
-        doc_tokens = self.tokenized_docs[doc_idx]
-        doc_length = self.doc_lengths[doc_idx]
-        
-        # Count term frequencies in document
-        doc_term_freqs = Counter(doc_tokens)
-        
-        for token in query_tokens:
-            if token not in self.idf:
-                continue
-            
-            term_freq = doc_term_freqs.get(token, 0)
-            idf_score = self.idf[token]
-
-            # BM25 formula
-            numerator = term_freq * (self.k1 + 1)
-            denominator = term_freq + self.k1 * (1 - self.b + self.b * (doc_length / self.avg_doc_length))
-            
-            score += idf_score * (numerator / denominator)
-        
-        return score                
+        score = np.float32(0)
+        if not self.avg_doc_length:
+            return float(score)
+        # Binary-search doc_idx in each query term's posting list: O(|q| log df), not O(N)
+        for token_id in self._query_columns(query_tokens):
+            start, end = self.postings.indptr[token_id], self.postings.indptr[token_id + 1]
+            doc_ids = self.postings.indices[start:end]
+            pos = np.searchsorted(doc_ids, doc_idx)
+            if pos < len(doc_ids) and doc_ids[pos] == doc_idx:
+                score += self.postings.data[start + pos]
+        return float(score)
 
     def retrieve(self, query: str, top_k: int = None) -> List[Tuple[str, float]]:
         """
@@ -124,18 +378,144 @@ class BM25Retriever:
         
         query_tokens = self.tokenize(query)
 
-        # Calculate scores for all documents
-        scores = []
-        for idx in range(len(self.documents)):
-            score = self.calculate_bm25_score(query_tokens, idx)
-            scores.append((idx, score))
-        
-        # Sort by score (descending) and get top-k
-        scores.sort(key=lambda x: x[1], reverse=True)
-        top_results = scores[:top_k]
+        # Calculate scores, pruning documents that can't make the top-k
+        scores = self.score_documents(query_tokens, top_k=top_k)
+
+        # Partial selection instead of sorting the whole corpus
+        top_idx = self.select_top_k(scores, top_k)
+        top_results = [(idx, float(scores[idx])) for idx in top_idx]
         
         # Return documents with scores
         results = [(self.documents[idx], score) for idx, score in top_results]
         
-        # logger.debug(f"Retrieved {len(results)} documents for query: {query}")
+        # logger.debug("Retrieved %s documents for query: %s", len(results), query)
+        return results
+
+    def retrieve_batch(self, queries: List[str], top_k: int = None) -> List[List[Tuple[str, float]]]:
+        """
+        Retrieve top-k documents for several queries with one sparse matmul
+
+        Args:
+            queries: Search queries
+            top_k: Number of documents to retrieve per query
+
+        Returns:
+            One list of (document, score) tuples per query
+        """
+        if top_k is None:
+            top_k = Config.TOP_K_RETRIEVAL
+
+        # Query-term count matrix (queries x vocabulary); repeated terms count repeatedly, as in retrieve()
+        indptr = [0]
+        indices = []
+        for query in queries:
+            indices.extend(self._query_columns(self.tokenize(query)).tolist())
+            indptr.append(len(indices))
+        query_terms = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(queries), self.postings.shape[1]),
+        )
+
+        # (queries x vocabulary) @ (vocabulary x documents) over the precomputed BM25 scores
+        scores = np.asarray((query_terms @ self.postings.T).todense(), dtype=np.float32)
+
+        results = []
+        for row in scores:
+            top_idx = self.select_top_k(row, top_k)
+            results.append([(self.documents[idx], float(row[idx])) for idx in top_idx])
         return results
+
+
+class BM25sRetriever:
+    """
+    BM25 retrieval backed by the bm25s library
+    Precomputes per-token document scores into a sparse matrix at index time,
+    so a query is a sparse lookup. Same interface as BM25Retriever.
+    Selected with BM25_BACKEND=bm25s (requires `pip install bm25s`, plus numba
+    for the JIT-compiled scoring backend).
+
+    bm25s uses the Lucene scoring variant, which omits the constant (k1 + 1)
+    factor: scores are scaled relative to BM25Retriever but rank identically.
+    """
+
+    # Same tokenizer as the native retriever so both backends index identical terms
+    tokenize = BM25Retriever.tokenize
+
+    def __init__(self, k1: float = None, b: float = None):
+        """
+        Initialize bm25s retriever
+
+        Args:
+            k1: Term frequency saturation parameter
+            b: Length normalization parameter
+        """
+        import bm25s
+
+        self.k1 = k1 or Config.BM25_K1
+        self.b = b or Config.BM25_B
+        self.documents = []
+        # "auto" uses the numba-compiled top-k scorer when numba is installed
+        self.model = bm25s.BM25(k1=self.k1, b=self.b, backend=Config.BM25S_SCORING_BACKEND)
+
+    @property
+    def vocab_size(self) -> int:
+        """Number of distinct indexed tokens"""
+        vocab = getattr(self.model, "vocab_dict", None) or {}
+        # bm25s reserves an empty-string token for out-of-vocabulary query terms
+        return len(vocab) - ("" in vocab)
+
+    def index_documents(self, documents: List[str]):
+        """
+        Index documents for BM25 retrieval
+
+        Args:
+            documents: List of document strings
+        """
+        self.documents = documents
+        if documents:
+            self.model.index([self.tokenize(doc) for doc in documents], show_progress=False)
+
+    def retrieve(self, query: str, top_k: int = None) -> List[Tuple[str, float]]:
+        """
+        Retrieve top-k documents for a query
+
+        Args:
+            query: Search query
+            top_k: Number of documents to retrieve
+
+        Returns:
+            List of (document, score) tuples
+        """
+        if top_k is None:
+            top_k = Config.TOP_K_RETRIEVAL
+
+        top_k = min(top_k, len(self.documents))
+        if top_k <= 0:
+            return []
+
+        doc_ids, scores = self.model.retrieve([self.tokenize(query)], k=top_k, show_progress=False)
+        return [(self.documents[idx], float(score)) for idx, score in zip(doc_ids[0], scores[0])]
+
+    def retrieve_batch(self, queries: List[str], top_k: int = None) -> List[List[Tuple[str, float]]]:
+        """
+        Retrieve top-k documents for several queries in one bm25s call
+
+        Args:
+            queries: Search queries
+            top_k: Number of documents to retrieve per query
+
+        Returns:
+            One list of (document, score) tuples per query
+        """
+        if top_k is None:
+            top_k = Config.TOP_K_RETRIEVAL
+
+        top_k = min(top_k, len(self.documents))
+        if top_k <= 0 or not queries:
+            return [[] for _ in queries]
+
+        doc_ids, scores = self.model.retrieve([self.tokenize(query) for query in queries], k=top_k, show_progress=False)
+        return [
+            [(self.documents[idx], float(score)) for idx, score in zip(row_ids, row_scores)]
+            for row_ids, row_scores in zip(doc_ids, scores)
+        ]
@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import Config
 from app.routes import recipe_api
@@ -12,13 +13,13 @@ logger = setup_logger(__name__)
 # -----------------------------------------------------------------------------
 # Ensure required directories and recipe file exist
 # -----------------------------------------------------------------------------
-RECIPE_DIR = "data/raw_recipes"
-RECIPE_FILE = os.path.join(RECIPE_DIR, "recipes.txt")
+RECIPE_FILE = Config.RAW_RECIPES_PATH
+RECIPE_DIR = os.path.dirname(RECIPE_FILE)
 
 os.makedirs(RECIPE_DIR, exist_ok=True)
 
 if not os.path.exists(RECIPE_FILE):
-    logger.warning(f"Recipe file not found: {RECIPE_FILE}. Creating an empty file.")
+    logger.warning("Recipe file not found: %s. Creating an empty file.", RECIPE_FILE)
     with open(RECIPE_FILE, "w", encoding="utf-8") as f:
         f.write("# Chef Intelligence Recipe Database\n")
         f.write("# Add your recipes here in plain text format.\n")
@@ -29,9 +30,16 @@ if not os.path.exists(RECIPE_FILE):
 app = FastAPI(
     title="Chef Intelligence - Method 1",
     description="Direct RAG with Keyword Search (BM25)",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+@app.on_event("startup")
+async def configure_app():
+    """Validate settings and attach config logging once per process"""
+    Config.validate()
+    Config.setup_logging()
+
 # -----------------------------------------------------------------------------
 # Middleware
 # -----------------------------------------------------------------------------
@@ -77,7 +85,8 @@ def main():
         host=Config.HOST,
         port=Config.PORT,
         reload=Config.DEBUG,
-        workers=1  # Ensures PyTorch works safely inside Docker
+        # Each worker loads its own LLM; raise WORKERS for out-of-process backends (ignored with reload)
+        workers=Config.WORKERS
     )
 
 if __name__ == "__main__":
@@ -4,25 +4,54 @@ from typing import List, Optional
 from datetime import date
 from fastapi import FastAPI, HTTPException, status, APIRouter
 from pydantic import BaseModel, Field
-from pymongo import MongoClient, errors
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, errors
 from bson.objectid import ObjectId
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
 
 # ---------- Config ----------
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = "chefdb"
 COLLECTION_NAME = "users"
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 5))
+# zstd needs the `zstandard` package; pymongo skips unavailable compressors with a warning
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd")
 
 # ---------- DB Setup ----------
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-users_col = db[COLLECTION_NAME]
+# Async driver: handlers await Mongo on the event loop instead of blocking threadpool workers.
+# The client (and its pool) is created on first use, per worker process, not at import.
+_client = None
+_indexes_ready = False
 
-# ensure unique index on unique_id
-try:
-    users_col.create_index("unique_id", unique=True)
-except errors.OperationFailure:
-    # index may already exist or insufficient privileges — ignore for now
-    pass
+async def get_col():
+    global _client, _indexes_ready
+    # No await between the check and the assignment, so this is race-free on the event loop
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            compressors=MONGO_COMPRESSORS,
+            serverSelectionTimeoutMS=2000,
+            socketTimeoutMS=10000,
+        )
+    users_col = _client[DB_NAME][COLLECTION_NAME]
+    if not _indexes_ready:
+        # ensure unique index on unique_id (idempotent)
+        try:
+            await users_col.create_index("unique_id", unique=True)
+            _indexes_ready = True
+        except errors.OperationFailure as e:
+            # e.g. insufficient privileges: retrying won't help, so give up once
+            _indexes_ready = True
+            logger.warning("Could not ensure unique index on %s.unique_id: %s", COLLECTION_NAME, e)
+        except errors.ConnectionFailure as e:
+            # transient (covers ServerSelectionTimeoutError): retried on the next call
+            logger.warning("Mongo unreachable, unique index on %s.unique_id not ensured yet: %s", COLLECTION_NAME, e)
+    return users_col
 
 # ---------- Pydantic Models ----------
 class UserCreate(BaseModel):
@@ -48,6 +77,9 @@ class LoginModel(BaseModel):
 class MessageIn(BaseModel):
     message: str
 
+# Fields never sent back to clients; excluded server-side to shrink responses
+USER_PROJECTION = {"password": 0}
+
 # ---------- App ----------
 app = APIRouter()
 
@@ -64,31 +96,33 @@ def serialize_user(doc) -> UserOut:
 
 # ---------- Routes ----------
 @app.post("/signup", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def signup(user: UserCreate):
+async def signup(user: UserCreate):
     """
     Create a new user. unique_id must be unique.
     Password will be stored as plain text (insecure) as requested.
     """
+    users_col = await get_col()
     doc = user.model_dump()
     # ensure messages exists
     if "messages" not in doc or doc["messages"] is None:
         doc["messages"] = []
 
     try:
-        result = users_col.insert_one(doc)
+        result = await users_col.insert_one(doc)
     except errors.DuplicateKeyError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="unique_id already exists")
-    created = users_col.find_one({"_id": result.inserted_id})
+    created = await users_col.find_one({"_id": result.inserted_id})
     return serialize_user(created)
 
 @app.post("/login", response_model=UserOut)
-def login(payload: LoginModel):
+async def login(payload: LoginModel):
     """
     Simple login by matching unique_id + password (plain text check).
     Returns user (without password).
     """
-    doc = users_col.find_one({"unique_id": payload.unique_id})
+    users_col = await get_col()
+    doc = await users_col.find_one({"unique_id": payload.unique_id})
     if not doc:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="Invalid credentials")
@@ -98,32 +132,35 @@ def login(payload: LoginModel):
     return serialize_user(doc)
 
 @app.get("/users/{unique_id}", response_model=UserOut)
-def get_user(unique_id: str):
-    doc = users_col.find_one({"unique_id": unique_id})
+async def get_user(unique_id: str):
+    users_col = await get_col()
+    doc = await users_col.find_one({"unique_id": unique_id}, USER_PROJECTION)
     if not doc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return serialize_user(doc)
 
 @app.post("/users/{unique_id}/messages", response_model=UserOut)
-def add_message(unique_id: str, payload: MessageIn):
+async def add_message(unique_id: str, payload: MessageIn):
     """
     Append a message string to the user's messages array.
     """
-    update_result = users_col.find_one_and_update(
+    users_col = await get_col()
+    # ReturnDocument.AFTER returns the updated doc, so no second fetch is needed
+    # (the lookup uses the unique index on unique_id)
+    update_result = await users_col.find_one_and_update(
         {"unique_id": unique_id},
         {"$push": {"messages": payload.message}},
-        return_document=True
+        projection=USER_PROJECTION,
+        return_document=ReturnDocument.AFTER
     )
     if not update_result:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    # find_one_and_update with return_document=True returns BEFORE doc in PyMongo by default
-    # To simplify, fetch fresh doc:
-    doc = users_col.find_one({"unique_id": unique_id})
-    return serialize_user(doc)
+    return serialize_user(update_result)
 
 @app.delete("/users/{unique_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(unique_id: str):
-    res = users_col.delete_one({"unique_id": unique_id})
+async def delete_user(unique_id: str):
+    users_col = await get_col()
+    res = await users_col.delete_one({"unique_id": unique_id})
     if res.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return None
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, status, UploadFile, File
 from pydantic import BaseModel
-from typing import List, Optional
-from app.core.retriever import BM25Retriever
+from typing import List, Optional, Union
+from app.core.retriever import BM25Retriever, BM25sRetriever
 from app.core.llm_manager import get_llm_manager
 from app.utils.text_processor import TextProcessor
 from app.utils.logger import setup_logger
@@ -11,7 +11,7 @@ import torch
 import platform
 from pathlib import Path
 import shutil
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from app.utils.document_segmentation import PDFExtraction
 router = APIRouter()
 logger = setup_logger(__name__)
@@ -24,7 +24,7 @@ DATA_FOLDER = Path(__file__).parent / "data"
 DATA_FOLDER.mkdir(parents=True, exist_ok=True)
 
 # Retriever will be initialized in startup (safer for Docker)
-retriever: BM25Retriever = None
+retriever: Union[BM25Retriever, BM25sRetriever] = None
 
 # LLM manager singleton
 llm_manager = None
@@ -33,7 +33,7 @@ def get_or_init_llm():
     """Get or initialize LLM manager (singleton)"""
     global llm_manager
     if llm_manager is None:
-        logger.info(f"Initializing TinyLlama (first request) on {platform.system()}...")
+        logger.info("Initializing TinyLlama (first request) on %s...", platform.system())
         llm_manager = get_llm_manager()
     return llm_manager
 
@@ -42,22 +42,28 @@ async def startup_event():
     """Initialize retriever with recipe data safely"""
     global retriever
     try:
-        retriever = BM25Retriever()  # Initialize retriever safely
+        # Initialize retriever safely
+        if Config.BM25_BACKEND == "bm25s":
+            retriever = BM25sRetriever()
+        else:
+            retriever = BM25Retriever(cache_dir=Config.PROCESSED_CHUNKS_PATH)
         
         if os.path.exists(Config.RAW_RECIPES_PATH):
-            with open(Config.RAW_RECIPES_PATH, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            chunks = text_processor.semantic_chunking(content)
+            # Stream paragraphs from the recipe file instead of reading it whole
+            paragraphs = text_processor.iter_paragraphs(Config.RAW_RECIPES_PATH)
+            chunks = text_processor.chunk_text(paragraphs)
             if chunks:
                 retriever.index_documents(chunks)
-                logger.info(f"✓ Indexed {len(chunks)} recipe chunks")
+                logger.info("✓ Indexed %d recipe chunks", len(chunks))
+
+                # Warm up the scorer (triggers numba JIT compilation for bm25s) before the first request
+                retriever.retrieve("warmup", top_k=1)
             else:
                 logger.warning("No chunks generated from recipe file.")
         else:
-            logger.warning(f"Recipe file not found: {Config.RAW_RECIPES_PATH}")
+            logger.warning("Recipe file not found: %s", Config.RAW_RECIPES_PATH)
     except Exception as e:
-        logger.error(f"Error during startup: {str(e)}")
+        logger.error("Error during startup: %s", e)
         retriever = BM25Retriever()  # fallback empty retriever
 
 # Request/Response Models
@@ -82,7 +88,7 @@ async def query_recipe(request: RecipeQueryRequest):
     """Query recipes using BM25 keyword search with TinyLlama generation"""
     global retriever
     try:
-        logger.info(f"Processing query: {request.query}")
+        logger.info("Processing query: %s", request.query)
         
         # Step 1: Retrieve relevant chunks using BM25
         if retriever is None or not retriever.documents:
@@ -122,7 +128,7 @@ async def query_recipe(request: RecipeQueryRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error processing query: {str(e)}")
+        logger.error("Error processing query: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing query: {str(e)}"
@@ -134,7 +140,7 @@ async def get_stats():
     global retriever
     return {
         "total_chunks": len(retriever.documents) if retriever else 0,
-        "indexed_tokens": len(retriever.idf) if retriever else 0,
+        "indexed_tokens": retriever.vocab_size if retriever else 0,
         "method": "BM25 Keyword Search",
         "model": "TinyLlama-1.1B-Chat-v1.0",
         "device": get_or_init_llm().device if llm_manager else "unknown",
@@ -152,7 +158,8 @@ async def get_model_info():
         "temperature": Config.LLM_TEMPERATURE,
         "quantization": {
             "8bit": Config.LOAD_IN_8BIT,
-            "4bit": Config.LOAD_IN_4BIT
+            "4bit": Config.LOAD_IN_4BIT,
+            "format": llm.quantization
         },
         "status": "loaded",
         "os": platform.system()
@@ -176,7 +183,7 @@ async def upload_file(file: UploadFile = File(...)):
         if ext == "pdf":
             # Run PDF extraction function
             extracted_text = pdf_extractor.extract_pdf(str(file_path))
-            return JSONResponse(content={
+            return ORJSONResponse(content={
                 "message": "File uploaded and processed successfully",
                 "file_path": str(file_path),
                 "result": extracted_text
@@ -184,13 +191,13 @@ async def upload_file(file: UploadFile = File(...)):
 
         elif ext in ["xls", "xlsx"]:
             # You can add Excel parsing here if needed
-            return JSONResponse(content={
+            return ORJSONResponse(content={
                 "message": "Excel file uploaded successfully",
                 "file_path": str(file_path)
             })
 
         else:
-            return JSONResponse(content={
+            return ORJSONResponse(content={
                 "message": f"File '{file.filename}' uploaded but not processed (unsupported type)",
                 "file_path": str(file_path)
             })
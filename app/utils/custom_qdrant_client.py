@@ -48,23 +48,35 @@ qclient = QdrantClient(
 #     )
 
 
-def ensure_collection(collection_name: str, dim: int, distance: models.Distance = models.Distance.COSINE) -> None:
+# Collections already verified/created by this process; skips repeat round-trips
+_ready_collections = set()
+
+
+def ensure_collection(collection_name: str, dim: int, distance: models.Distance = models.Distance.COSINE) -> bool:
     """
     Ensure a simple dense collection exists.
     - If it already exists, it will be reused as-is (no deletion or validation).
     - If not, it will be created with the given dimension and distance.
+    - Idempotent: once a collection is known to exist, later calls make no request.
+    Returns True if the collection is ready.
     """
+    if collection_name in _ready_collections:
+        return True
+
     try:
         if qclient.collection_exists(collection_name):
             print(f"Collection '{collection_name}' already exists — using existing one.")
-            return
+        else:
+            # Create if it doesn't exist
+            qclient.create_collection(
+                collection_name=collection_name,
+                vectors_config=models.VectorParams(size=dim, distance=distance),
+            )
+            print(f"Created new collection '{collection_name}' (dim={dim}, distance={distance}).")
 
-        # Create if it doesn't exist
-        qclient.create_collection(
-            collection_name=collection_name,
-            vectors_config=models.VectorParams(size=dim, distance=distance),
-        )
-        print(f"Created new collection '{collection_name}' (dim={dim}, distance={distance}).")
+        _ready_collections.add(collection_name)
+        return True
 
     except Exception as e:
         print(f"Error ensuring collection '{collection_name}': {e}")
+        return False
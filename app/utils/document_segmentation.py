@@ -1,15 +1,40 @@
 import os
 import io
-import csv
 import tempfile
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import pdfplumber
 from PyPDF2 import PdfReader
 from pdf2image import convert_from_path
 import pytesseract
 from PIL import Image
+import numpy as np
 import pandas as pd
 
+
+def _ocr_page(args):
+    """OCR one rasterized page image file (runs in a worker process): returns (page_no, text, line_rows)"""
+    i, img_path = args
+    with Image.open(img_path) as img:
+        text = pytesseract.image_to_string(img)
+        data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
+
+    rows = []
+    words = np.array(data["text"], dtype=object)
+    keep = np.array([bool(w.strip()) for w in words], dtype=bool)
+    if keep.any():
+        # One sortable key per (block, paragraph, line); a stable sort keeps word order within a line
+        keys = (
+            np.asarray(data["block_num"], dtype=np.int64) * 1_000_000
+            + np.asarray(data["par_num"], dtype=np.int64) * 1_000
+            + np.asarray(data["line_num"], dtype=np.int64)
+        )[keep]
+        order = np.argsort(keys, kind="stable")
+        boundaries = np.flatnonzero(np.diff(keys[order])) + 1
+        rows = [" ".join(line) for line in np.split(words[keep][order], boundaries)]
+    return i, text, rows
+
+
 class PDFExtraction:
     def is_text_based(self, pdf_path, check_pages=3):
         try:
@@ -25,13 +50,13 @@ class PDFExtraction:
 
     def extract_text_and_tables_textpdf(self, pdf_path, out_txt_path, tables_out_dir):
         os.makedirs(tables_out_dir, exist_ok=True)
-        all_text = []
 
-        with pdfplumber.open(pdf_path) as pdf:
+        # Pages are written as they are extracted instead of buffered in a list
+        with pdfplumber.open(pdf_path) as pdf, open(out_txt_path, "w", encoding="utf-8", buffering=1 << 20) as f:
             table_count = 0
             for i, page in enumerate(pdf.pages, start=1):
                 text = page.extract_text() or ""
-                all_text.append(f"=== PAGE {i} ===\n{text}\n\n")
+                f.write(f"=== PAGE {i} ===\n{text}\n\n")
 
                 tables = page.extract_tables()
                 for t in tables:
@@ -40,39 +65,40 @@ class PDFExtraction:
                     csv_path = os.path.join(tables_out_dir, f"table_p{i}_{table_count}.csv")
                     df.to_csv(csv_path, index=False, header=False)
 
-        with open(out_txt_path, "w", encoding="utf-8") as f:
-            f.writelines(all_text)
-
-        return "".join(all_text) 
+        return self._read_text(out_txt_path)
 
     def ocr_pdf_to_text_and_tables(self, pdf_path, out_txt_path, tables_out_dir, dpi=300):
         os.makedirs(tables_out_dir, exist_ok=True)
-        pages = convert_from_path(pdf_path, dpi=dpi)
-        all_text = []
         table_count = 0
 
-        for i, img in enumerate(pages, start=1):
-            text = pytesseract.image_to_string(img)
-            all_text.append(f"=== PAGE {i} ===\n{text}\n\n")
+        # Pages are rasterized in parallel to temp PNGs rather than held in RAM as PIL images;
+        # workers get file paths, so no pixel data is pickled between processes
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            page_paths = convert_from_path(
+                pdf_path, dpi=dpi, output_folder=tmp_dir, fmt="png",
+                thread_count=os.cpu_count(), paths_only=True
+            )
+
+            # Tesseract is single-threaded per call, so pages are OCR'd in parallel processes;
+            # map() yields results in page order, each written out as soon as it arrives
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor, \
+                    open(out_txt_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+                for i, text, rows in executor.map(_ocr_page, enumerate(page_paths, start=1)):
+                    f.write(f"=== PAGE {i} ===\n{text}\n\n")
 
-            tsv = pytesseract.image_to_data(img, output_type=pytesseract.Output.DATAFRAME)
-            if tsv is not None and not tsv.empty:
-                tsv = tsv[tsv['text'].notna() & (tsv['text'].str.strip() != "")]
-                if not tsv.empty:
-                    grouped = tsv.groupby(['block_num', 'par_num', 'line_num'])
-                    rows = [" ".join(g['text'].tolist()) for _, g in grouped]
                     if len(rows) > 1:
                         table_count += 1
                         csv_path = os.path.join(tables_out_dir, f"ocr_table_p{i}.csv")
-                        with open(csv_path, "w", newline="", encoding="utf-8") as csvfile:
-                            writer = csv.writer(csvfile)
-                            for r in rows:
-                                writer.writerow([col for col in r.split("  ") if col.strip()])
+                        cells = [[col for col in r.split("  ") if col.strip()] for r in rows]
+                        pd.DataFrame(cells).to_csv(csv_path, index=False, header=False)
 
-        with open(out_txt_path, "w", encoding="utf-8") as f:
-            f.writelines(all_text)
+        return self._read_text(out_txt_path)
 
-        return "".join(all_text)
+    @staticmethod
+    def _read_text(path):
+        # The written file is the only full copy of the text until the caller asks for it
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
 
     def extract_pdf(self, pdf_path, output_dir="output_extraction"):
         Path(output_dir).mkdir(parents=True, exist_ok=True)
@@ -1,36 +1,38 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 from datetime import datetime
 from app.config import Config
 
-def setup_logger(name: str) -> logging.Logger:
-    """
-    Setup custom logger
-    
-    Args:
-        name: Logger name
-        
-    Returns:
-        Configured logger
-    """
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+# Shared by every logger: records are queued by the caller and written by a background thread
+_log_queue = queue.Queue(-1)
+_listener = None
+
+def _start_listener():
+    """Create the file/console handlers once and start the thread that drains the log queue"""
+    global _listener
 
     # Create logs directory if it doesn't exist
     os.makedirs(Config.LOGS_PATH, exist_ok=True)
 
-    # File handler
+    # File handler (rotated so the log cannot grow unbounded). Rotation is not safe across
+    # processes, so with several uvicorn workers each one writes its own pid-suffixed file.
+    suffix = f"_{os.getpid()}" if Config.WORKERS > 1 else ""
     log_file = os.path.join(
         Config.LOGS_PATH,
-        f"chef_intelligence_{datetime.now().strftime('%Y%m%d')}.log"
+        f"chef_intelligence_{datetime.now().strftime('%Y%m%d')}{suffix}.log"
+    )
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=50 * 1024 * 1024, backupCount=5, encoding="utf-8"
     )
-    file_handler = logging.FileHandler(log_file)
     file_handler.setLevel(logging.INFO)
 
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
-    
+
     # Formatter
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -38,9 +40,31 @@ def setup_logger(name: str) -> logging.Logger:
     file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
 
-    # Add handlers
+    _listener = logging.handlers.QueueListener(
+        _log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _listener.start()
+    # Flush queued records on interpreter exit
+    atexit.register(_listener.stop)
+
+def setup_logger(name: str) -> logging.Logger:
+    """
+    Setup custom logger
+
+    Args:
+        name: Logger name
+
+    Returns:
+        Configured logger
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+
+    if _listener is None:
+        _start_listener()
+
+    # Add handler: only enqueues, file/console I/O happens on the listener thread
     if not logger.handlers:
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-    
+        logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+
     return logger
@@ -3,12 +3,16 @@ from typing import List, Dict, Any
 import pandas as pd
 
 def df_to_docs(df: pd.DataFrame, text_col: str, meta_cols: List[str]) -> List[Dict[str, Any]]:
-    docs = []
-    for _, row in df.iterrows():
-        text = str(row[text_col]) if pd.notna(row[text_col]) else ""
-        if not text.strip():
-            continue
-        md = {c: (row[c] if c in row and pd.notna(row[c]) else "") for c in meta_cols}
-        docs.append({"text": text, "metadata": md})
-    return docs
+    # Column-wise conversion: no per-row Series boxing as with iterrows()
+    texts = df[text_col].fillna("").astype(str)
+    keep = (texts.str.strip() != "").to_numpy()
 
+    # Missing values (and missing columns) become "" in the metadata
+    meta_values = [
+        df[c].astype(object).where(df[c].notna(), "").to_numpy()[keep] if c in df.columns else [""] * int(keep.sum())
+        for c in meta_cols
+    ]
+    return [
+        {"text": text, "metadata": dict(zip(meta_cols, md))}
+        for text, *md in zip(texts.to_numpy()[keep], *meta_values)
+    ]
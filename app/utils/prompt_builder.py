@@ -1,6 +1,25 @@
-from typing import List, Tuple
+from functools import lru_cache
+from typing import List, Optional, Tuple
 import os
 
+
+def _load_and_split(template_path: str) -> Optional[Tuple[str, str]]:
+    """Split prompt template as (system_prompt, user_template); None if missing"""
+    # Misses are not cached, so a template created after first use is still picked up
+    if not os.path.exists(template_path):
+        return None
+    return _read_and_split(template_path)
+
+@lru_cache(maxsize=8)
+def _read_and_split(template_path: str) -> Optional[Tuple[str, str]]:
+    """Read a prompt template once and split it into (system_prompt, user_template)"""
+    with open(template_path, 'r', encoding='utf-8') as f:
+        template = f.read()
+    if not template:
+        return None
+    parts = template.split("---USER_PROMPT---")
+    return parts[0].strip(), parts[1].strip()
+
 class PromptBuilder:
     """
     Custom prompt construction for Method 1
@@ -11,13 +30,6 @@ class PromptBuilder:
         """Initialize prompt builder"""
         self.base_prompt_path = "templates/base_prompt.txt"
 
-    def load_template(self, template_path: str) -> str:
-        """Load prompt template from file"""
-        if os.path.exists(template_path):
-            with open(template_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        return None
-
     def build_base_prompt(self, query: str, context_chunks: List[str]) -> Tuple[str, str]:
         """
         Build base prompt for recipe queries
@@ -30,12 +42,11 @@ class PromptBuilder:
             Tuple of (system_prompt, user_prompt)
         """
 
-        # Try to load template, fallback to default
-        template = self.load_template(self.base_prompt_path)
+        # Try to load template (read and split once per path), fallback to default
+        template = _load_and_split(self.base_prompt_path)
         
         if template:
-            system_prompt = template.split("---USER_PROMPT---")[0].strip()
-            user_template = template.split("---USER_PROMPT---")[1].strip()
+            system_prompt, user_template = template
         else:
             # Default prompts
             system_prompt = """You are Chef Intelligence, an AI culinary assistant.
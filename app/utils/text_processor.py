@@ -1,15 +1,24 @@
-from typing import List, Callable, Optional
+from typing import List, Callable, Iterable, Iterator, Optional, Union
 from app.config import Config
 from app.utils.logger import setup_logger
+import os
 import re
+import mmap
 import numpy as np
 
 logger = setup_logger(__name__)
 
+# Compiled once at import instead of on every call
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+
+# What bytes.strip() removes; a line made only of these separates paragraphs
+_ASCII_WHITESPACE = " \t\n\r\x0b\x0c"
+
 class TextProcessor:
     """
     Text processing utilities.
-    Two chunking strategies:
+    Three chunking strategies:
+      - chunk_text: paragraph-based chunking (Method 1)
       - semantic_chunking: uses an encoder function to split by semantic breaks
       - char_chunking: fallback chunk by characters with overlap
 
@@ -32,18 +41,132 @@ class TextProcessor:
         """
         if text is None:
             return ""
-        # collapse multiple whitespace/newlines into single space
-        text = re.sub(r"\s+", " ", text).strip()
-        return text
+        # collapse multiple whitespace/newlines into single space; str.split() treats exactly
+        # the characters matched by \s as whitespace, without the regex engine
+        return " ".join(text.split())
 
     def split_into_sentences(self, text: str) -> List[str]:
         """
         Simple sentence splitter (works reasonably for recipe instructions).
         """
         # Keep the delimiter and strip spaces
-        parts = re.split(r'(?<=[.!?])\s+', text)
+        parts = _SENTENCE_END_RE.split(text)
         return [p.strip() for p in parts if p.strip()]
 
+    @staticmethod
+    def split_paragraphs(text: str) -> Iterator[str]:
+        """
+        Split text into paragraphs separated by blank (whitespace-only) lines.
+        Same separator rule as iter_paragraphs, so a string and a file give the same paragraphs.
+        """
+        lines = []
+        for line in text.split("\n"):
+            if line.strip(_ASCII_WHITESPACE):
+                lines.append(line)
+            elif lines:
+                yield "\n".join(lines)
+                lines = []
+        if lines:
+            yield "\n".join(lines)
+
+    @staticmethod
+    def iter_paragraphs(path: str, encoding: str = "utf-8") -> Iterator[str]:
+        """
+        Stream paragraphs separated by blank (whitespace-only) lines from a text file.
+
+        The file is memory-mapped and scanned line by line, so only one paragraph
+        is decoded at a time instead of reading the whole corpus into a string.
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # One front-to-back pass: let the kernel read ahead aggressively
+                if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                lines = []
+                for line in iter(mm.readline, b""):
+                    if line.strip():
+                        lines.append(line)
+                    elif lines:
+                        yield b"".join(lines).decode(encoding, errors="replace")
+                        lines = []
+                if lines:
+                    yield b"".join(lines).decode(encoding, errors="replace")
+
+    def _overlap_tail(self, chunk: str) -> str:
+        """
+        Trailing words of a chunk, up to self.overlap characters, carried into the next chunk.
+        Only the end of the chunk is scanned, so the cost is O(overlap) rather than O(len(chunk)).
+        """
+        if self.overlap <= 0:
+            return ""
+        window = self.overlap + 1
+        while True:
+            start = max(len(chunk) - window, 0)
+            words = chunk[start:].split()
+            if start > 0 and words and not chunk[start - 1].isspace() and not chunk[start].isspace():
+                words = words[1:]  # cut mid-word by the window
+
+            tail = []
+            size = 0
+            for word in reversed(words):
+                size += len(word) + 1
+                if size > self.overlap + 1:
+                    return " ".join(reversed(tail))
+                tail.append(word)
+            if start == 0:
+                return " ".join(reversed(tail))
+            # Every word in the window fit (wide whitespace gaps): look further back
+            window *= 2
+
+    def chunk_text(self, text: Union[str, Iterable[str]]) -> List[str]:
+        """
+        Paragraph-based chunking: pack consecutive paragraphs into chunks of about
+        chunk_size characters. Each new chunk starts with the trailing words
+        (up to overlap characters) of the previous one. Paragraphs longer than
+        chunk_size are split with char_chunking.
+
+        Args:
+          text: full text (paragraphs separated by whitespace-only lines) or an iterable of paragraphs,
+                e.g. iter_paragraphs(path)
+
+        Returns:
+          list of chunk strings
+        """
+        paragraphs = self.split_paragraphs(text) if isinstance(text, str) else text
+
+        chunks = []
+        # Paragraphs of the chunk being built, and the length of their "\n\n" join;
+        # each chunk is joined once instead of re-copied on every append
+        parts = []
+        size = 0
+        for para in paragraphs:
+            para = para.strip()
+            if not para:
+                continue
+
+            if len(para) > self.chunk_size:
+                if parts:
+                    chunks.append("\n\n".join(parts))
+                    parts, size = [], 0
+                chunks.extend(self.char_chunking(para))
+                continue
+
+            if parts and size + len(para) + 2 > self.chunk_size:
+                chunk = "\n\n".join(parts)
+                chunks.append(chunk)
+                tail = self._overlap_tail(chunk)
+                parts = [tail, para] if tail else [para]
+                size = len(tail) + 2 + len(para) if tail else len(para)
+            else:
+                size += len(para) + 2 if parts else len(para)
+                parts.append(para)
+
+        if parts:
+            chunks.append("\n\n".join(parts))
+        return chunks
+
     def char_chunking(self, text: str, chunk_size: Optional[int] = None, overlap: Optional[int] = None) -> List[str]:
         """
         Deterministic chunk by characters with overlap (fallback).
@@ -52,19 +175,24 @@ class TextProcessor:
             return []
         cs = chunk_size or self.chunk_size
         ov = overlap or self.overlap
-        chunks = []
-        start = 0
-        n = len(text)
-        while start < n:
-            end = min(start + cs, n)
-            chunks.append(text[start:end].strip())
-            if end == n:
-                break
-            start = end - ov
-            if start < 0:
-                start = 0
+        starts, ends = self._char_chunk_offsets(len(text), cs, ov)
+        chunks = [text[start:end].strip() for start, end in zip(starts.tolist(), ends.tolist())]
         return [c for c in chunks if c]
 
+    @staticmethod
+    def _char_chunk_offsets(n: int, chunk_size: int, overlap: int):
+        """
+        Start/end offsets of fixed-size character windows over a text of length n,
+        each window starting `overlap` characters before the previous one ended.
+        The last window is the first one that reaches the end of the text.
+        """
+        # Windows must advance; an overlap >= chunk_size would never terminate
+        step = max(chunk_size - overlap, 1)
+        num_windows = -(-max(n - chunk_size, 0) // step) + 1
+        starts = np.arange(num_windows, dtype=np.int64) * step
+        ends = np.minimum(starts + chunk_size, n)
+        return starts, ends
+
     def semantic_chunking(self, text: str, encoder_fn: Callable[[List[str]], "np.ndarray"], similarity_threshold: float = 0.65, ) -> List[str]:
         """
         Chunk text using sentence-level semantic similarity.
@@ -96,13 +224,30 @@ class TextProcessor:
 
         # Get embeddings for sentences — ensure numpy array shape (N, D)
         emb = encoder_fn(sents)
+        return self.chunk_sentences(sents, emb, similarity_threshold=similarity_threshold)
+
+    def chunk_sentences(self, sents: List[str], emb: "np.ndarray", similarity_threshold: float = 0.65) -> List[str]:
+        """
+        Group consecutive sentences into chunks from precomputed sentence embeddings.
+
+        Lets callers encode sentences of many documents in one batch and chunk
+        each document afterwards from its slice of the embedding matrix.
+
+        Args:
+          sents: sentences of a single document, in order
+          emb: embeddings for sents, shape (len(sents), D)
+          similarity_threshold: cosine similarity cutoff to keep sentences in same chunk
+
+        Returns:
+          list of chunk strings
+        """
+        if len(sents) == 0:
+            return []
+
         emb = np.asarray(emb)
         if emb.ndim != 2 or emb.shape[0] != len(sents):
             # fallback to char chunking if encoder returned strange shape
-            return self.char_chunking(text)
-
-        chunks = []
-        current_chunk = [sents[0]]
+            return self.char_chunking(" ".join(sents))
 
         # pre-normalize vectors for cosine similarity
         norms = np.linalg.norm(emb, axis=1)
@@ -110,15 +255,11 @@ class TextProcessor:
         norms[norms == 0] = 1e-8
         emb_normed = emb / norms[:, None]
 
-        for i in range(1, len(sents)):
-            sim = float(np.dot(emb_normed[i - 1], emb_normed[i]))
-            if sim < similarity_threshold:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [sents[i]]
-            else:
-                current_chunk.append(sents[i])
-
-        chunks.append(" ".join(current_chunk))
+        # cosine similarity of every consecutive sentence pair in one vectorized pass
+        sims = np.einsum("ij,ij->i", emb_normed[:-1], emb_normed[1:])
+        # a new chunk starts at each sentence that is dissimilar to its predecessor
+        bounds = [0, *(np.nonzero(sims < similarity_threshold)[0] + 1).tolist(), len(sents)]
+        chunks = [" ".join(sents[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
 
         # As a final safety: merge very small chunks with neighbors
         merged = []
@@ -23,22 +23,19 @@ def build_index():
     
     # Initialize components
     text_processor = TextProcessor()
-    retriever = BM25Retriever()
+    retriever = BM25Retriever(cache_dir=Config.PROCESSED_CHUNKS_PATH)
 
     # Load raw recipes
-    logger.info(f"Loading recipes from {Config.RAW_RECIPES_PATH}")
+    logger.info("Loading recipes from %s", Config.RAW_RECIPES_PATH)
     
     if not os.path.exists(Config.RAW_RECIPES_PATH):
-        logger.error(f"Recipe file not found: {Config.RAW_RECIPES_PATH}")
+        logger.error("Recipe file not found: %s", Config.RAW_RECIPES_PATH)
         return
     
-    with open(Config.RAW_RECIPES_PATH, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # Chunk text
+    # Chunk text, streaming paragraphs from the file
     logger.info("Chunking text...")
-    chunks = text_processor.chunk_text(content)
-    logger.info(f"Created {len(chunks)} chunks")
+    chunks = text_processor.chunk_text(text_processor.iter_paragraphs(Config.RAW_RECIPES_PATH))
+    logger.info("Created %s chunks", len(chunks))
     
     # Index documents with BM25
     logger.info("Indexing chunks with BM25...")
@@ -46,8 +43,8 @@ def build_index():
     
     logger.info("="*70)
     logger.info("Index building complete!")
-    logger.info(f"Total chunks: {len(chunks)}")
-    logger.info(f"Unique tokens: {len(retriever.idf)}")
+    logger.info("Total chunks: %s", len(chunks))
+    logger.info("Unique tokens: %s", len(retriever.idf))
     logger.info("="*70)
 
 if __name__ == "__main__":
@@ -4,24 +4,183 @@ TinyLlama Model Downloader
 Pre-downloads the TinyLlama model to avoid slow first-time loading.
 
 Usage:
-    python scripts/download_model.py
+    python scripts/download_model.py [--consolidate]
+
+    --consolidate  merge sharded safetensors weights into a single model.safetensors
+                   (used only by offline loads: HF_HUB_OFFLINE=1 / TRANSFORMERS_OFFLINE=1)
 
 This script should be run BEFORE starting Docker to cache the model locally.
 """
 
 import os
 import sys
+import json
+import importlib.util
+import math
+import mmap
+import shutil
+import argparse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
 
+# Rust-based multi-connection downloader (hf_transfer); must be set before huggingface_hub is imported.
+# Only enabled when the package is installed: huggingface_hub raises on every download
+# (tokenizer included) if the flag is set without it
+if importlib.util.find_spec("hf_transfer") is not None:
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+
 # Add project root to path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from huggingface_hub import snapshot_download
+from tqdm.auto import tqdm
+from transformers import AutoTokenizer
 import torch
 
+# Config, tokenizer and generation files fetched alongside the weights
+MODEL_FILE_PATTERNS = ["*.json", "tokenizer*", "*.model", "*.txt"]
+
+
+def fetch_model_files(model_name, cache_dir, weight_pattern):
+    """Download the repo files matching weight_pattern (+ configs), shards in parallel; returns the snapshot dir"""
+    return snapshot_download(
+        repo_id=model_name,
+        cache_dir=str(cache_dir),
+        max_workers=8,
+        allow_patterns=[weight_pattern] + MODEL_FILE_PATTERNS,
+        # Overall file progress; each file's transfer also gets its own byte-level bar
+        tqdm_class=tqdm
+    )
+
+
+def scan_cache(root):
+    """
+    Walk a cache directory once with os.scandir (DirEntry caches stat results)
+
+    Returns:
+        (file count, total bytes, weight files) where weight files are the
+        *.safetensors entries, or the legacy *.bin ones if there are none.
+        Symlinks (HF snapshot entries) are counted by their own size.
+    """
+    n_files = total = 0
+    safetensors, bins = [], []
+    stack = [str(root)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                n_files += 1
+                total += entry.stat(follow_symlinks=False).st_size
+                if entry.name.endswith(".safetensors"):
+                    safetensors.append(entry.path)
+                elif entry.name.endswith(".bin"):
+                    bins.append(entry.path)
+    return n_files, total, safetensors or bins
+
+
+def prewarm_page_cache(paths):
+    """
+    Fault weight files into the OS page cache (readahead-advised, one byte per page)
+    so the next from_pretrained mmap, e.g. in the Docker container, is a cache hit.
+    """
+    for path in paths:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                continue
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # Advice values are not combinable flags: issue them separately (where supported)
+                for advice in ("MADV_SEQUENTIAL", "MADV_WILLNEED"):
+                    if hasattr(mm, "madvise") and hasattr(mmap, advice):
+                        mm.madvise(getattr(mmap, advice))
+                mm[::mmap.PAGESIZE]
+
 
-def download_model_with_progress():
+def count_parameters(snapshot_dir):
+    """
+    Total parameter count from the safetensors headers (8-byte length + JSON of
+    tensor shapes), without reading any weight data. Returns 0 without safetensors.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    consolidated = snapshot_dir / "model.safetensors"
+    # A consolidated file duplicates the shards next to it
+    files = [consolidated] if consolidated.exists() else sorted(snapshot_dir.glob("*.safetensors"))
+    total = 0
+    for path in files:
+        with open(path, "rb") as f:
+            header_len = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_len))
+        total += sum(math.prod(info["shape"]) for name, info in header.items() if name != "__metadata__")
+    return total
+
+
+def consolidate_shards(snapshot_dir):
+    """
+    Merge sharded safetensors weights into one model.safetensors in the snapshot folder,
+    so loads map a single file that readahead can stream sequentially.
+
+    Only offline loads (HF_HUB_OFFLINE=1 / TRANSFORMERS_OFFLINE=1) use the merged file:
+    online, the Hub answers 404 for model.safetensors on a sharded repo and transformers
+    fetches the shard index again. The local index and any cached "missing file" marker
+    for model.safetensors are removed so an offline from_pretrained resolves the merged file.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    target = snapshot_dir / "model.safetensors"
+    shards = sorted(p for p in snapshot_dir.glob("*.safetensors") if p.name != target.name)
+    if len(shards) <= 1:
+        print("   └─ Weights are already a single safetensors file")
+        return
+
+    from safetensors.torch import load_file, save_file
+
+    tensors = {}
+    for shard in shards:
+        tensors.update(load_file(str(shard)))
+    tmp_path = target.with_name(target.name + ".tmp")
+    save_file(tensors, str(tmp_path), metadata={"format": "pt"})
+    os.replace(tmp_path, target)
+
+    # Snapshot layout: <repo>/snapshots/<revision>/ with 404 markers under <repo>/.no_exist/<revision>/
+    no_exist_marker = snapshot_dir.parent.parent / ".no_exist" / snapshot_dir.name / target.name
+    for path in (snapshot_dir / "model.safetensors.index.json", no_exist_marker):
+        path.unlink(missing_ok=True)
+    print(f"   └─ Consolidated {len(shards)} shards into {target.name}")
+    print("   └─ Load with HF_HUB_OFFLINE=1 to use it; online loads still fetch the shards")
+
+
+def confirm_disk_space(disk_check):
+    """
+    Report the result of a background shutil.disk_usage call and, if space is low,
+    ask whether to continue. Never blocks: a slow check is skipped after 2s, and
+    without a terminal (CI/Docker) the download proceeds instead of prompting.
+    """
+    try:
+        total, used, free = disk_check.result(timeout=2.0)
+    except FutureTimeoutError:
+        print("⚠️  Disk space check timed out, skipping")
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not check disk space: {e}")
+        return True
+
+    free_gb = free // (2**30)
+    print(f"💿 Free Disk Space: {free_gb} GB")
+
+    if free_gb < 3:
+        print("⚠️  WARNING: Low disk space! Need at least 3GB free.")
+        if not sys.stdin.isatty():
+            print("   └─ Non-interactive session, continuing")
+            return True
+        response = input("Continue anyway? (y/n): ")
+        if response.lower() != 'y':
+            print("❌ Download cancelled.")
+            return False
+    return True
+
+
+def download_model_with_progress(consolidate=False):
     """Download TinyLlama model with progress indication"""
     
     # Use the same cache directory as config.py
@@ -31,39 +190,26 @@ def download_model_with_progress():
     # Create cache directory
     cache_dir.mkdir(parents=True, exist_ok=True)
     
+    # Check disk space in the background (statvfs can stall on network mounts)
+    # while the tokenizer downloads; it only has to pass before the model weights
+    disk_executor = ThreadPoolExecutor(max_workers=1)
+    disk_check = disk_executor.submit(shutil.disk_usage, cache_dir.parent)
+    disk_executor.shutdown(wait=False)
+    
     print("=" * 70)
     print("🚀 TinyLlama Model Downloader for Chef Intelligence")
     print("=" * 70)
     print(f"📦 Model: {model_name}")
     print(f"💾 Cache Directory: {cache_dir}")
-    print(f"📊 Expected Size: ~2.2 GB")
+    print(f"📊 Expected Size: ~2.2 GB (bf16 weights)")
     print(f"🖥️  System: {sys.platform}")
     print(f"🐍 Python: {sys.version.split()[0]}")
     print(f"🔥 PyTorch: {torch.__version__}")
     print("=" * 70)
     
-    # Check disk space
-    try:
-        import shutil
-        total, used, free = shutil.disk_usage(cache_dir.parent)
-        free_gb = free // (2**30)
-        print(f"💿 Free Disk Space: {free_gb} GB")
-        
-        if free_gb < 3:
-            print("⚠️  WARNING: Low disk space! Need at least 3GB free.")
-            response = input("Continue anyway? (y/n): ")
-            if response.lower() != 'y':
-                print("❌ Download cancelled.")
-                return False
-    except Exception as e:
-        print(f"⚠️  Could not check disk space: {e}")
-    
-    print("\n" + "=" * 70)
-    
     try:
         # Download tokenizer
         print("\n[Step 1/2] 📥 Downloading Tokenizer...")
-        print("⏳ Please wait...")
         
         tokenizer = AutoTokenizer.from_pretrained(
             model_name,
@@ -72,31 +218,39 @@ def download_model_with_progress():
         print("✅ Tokenizer downloaded successfully!")
         print(f"   └─ Vocab size: {tokenizer.vocab_size}")
         
+        print("\n" + "=" * 70)
+        if not confirm_disk_space(disk_check):
+            return False
+        print("=" * 70)
+        
         # Download model
         print("\n[Step 2/2] 📥 Downloading Model...")
-        print("⏳ This may take 5-20 minutes depending on your internet speed...")
-        print("   Downloading 2.2GB of model weights...")
+        print("   Downloading 2.2GB of bf16 model weights...")
         
-        model = AutoModelForCausalLM.from_pretrained(
-            model_name,
-            cache_dir=str(cache_dir),
-            low_cpu_mem_usage=True,
-            torch_dtype=torch.float32
-        )
+        # Files only: the weights are not instantiated as a model here, so the downloader's
+        # peak RAM stays small and no deserialization pass is spent on a throwaway model.
+        # safetensors weights are mmap'd on load instead of unpickled like pytorch_model.bin.
+        snapshot_dir = fetch_model_files(model_name, cache_dir, "*.safetensors")
+        if not scan_cache(snapshot_dir)[2]:
+            print("   └─ No safetensors weights in repo, falling back to pytorch_model.bin")
+            fetch_model_files(model_name, cache_dir, "*.bin")
+        elif consolidate:
+            consolidate_shards(snapshot_dir)
         
         print("✅ Model downloaded successfully!")
         
         # Get model info
-        param_count = sum(p.numel() for p in model.parameters())
-        print(f"   └─ Parameters: {param_count:,} (~1.1B)")
+        param_count = count_parameters(snapshot_dir)
+        if param_count:
+            print(f"   └─ Parameters: {param_count:,} (~1.1B)")
         
         # Verify cache
-        cached_files = list(cache_dir.rglob("*"))
-        cache_size = sum(f.stat().st_size for f in cached_files if f.is_file())
+        n_files, cache_size, weight_files = scan_cache(cache_dir)
+        prewarm_page_cache(weight_files)
         cache_size_mb = cache_size / (1024 * 1024)
         
         print(f"\n📊 Cache Statistics:")
-        print(f"   └─ Total files: {len(cached_files)}")
+        print(f"   └─ Total files: {n_files}")
         print(f"   └─ Cache size: {cache_size_mb:.1f} MB")
         print(f"   └─ Location: {cache_dir}")
         
@@ -126,14 +280,13 @@ def download_model_with_progress():
         print("   4. Check HuggingFace status: https://status.huggingface.co/")
         print(f"   5. Error details: {type(e).__name__}")
         
-        # Clean up partial downloads
+        # Clean up partial downloads only: completed files (e.g. the tokenizer) are kept for the retry
         if cache_dir.exists():
             print("\n🧹 Cleaning up partial downloads...")
             try:
-                import shutil
-                for item in cache_dir.iterdir():
-                    if item.is_dir():
-                        shutil.rmtree(item, ignore_errors=True)
+                for pattern in ("*.incomplete", "*.lock"):
+                    for path in cache_dir.rglob(pattern):
+                        path.unlink(missing_ok=True)
                 print("   └─ Cleanup complete")
             except Exception as cleanup_err:
                 print(f"   └─ Cleanup error: {cleanup_err}")
@@ -148,11 +301,10 @@ def check_existing_model():
     if not cache_dir.exists():
         return False
     
-    # Check for model files
-    model_files = list(cache_dir.rglob("*.bin")) + list(cache_dir.rglob("*.safetensors"))
+    # Check for model files (safetensors first; legacy .bin weights only without them)
+    _, cache_size, model_files = scan_cache(cache_dir)
     
     if model_files:
-        cache_size = sum(f.stat().st_size for f in cache_dir.rglob("*") if f.is_file())
         cache_size_mb = cache_size / (1024 * 1024)
         
         print("=" * 70)
@@ -163,6 +315,9 @@ def check_existing_model():
         print(f"📄 Model files: {len(model_files)}")
         print("=" * 70)
         
+        # Without a terminal (CI/Docker) keep the existing cache instead of blocking on input()
+        if not sys.stdin.isatty():
+            return True
         response = input("\n⚠️  Re-download model? (y/n): ")
         return response.lower() != 'y'
     
@@ -170,6 +325,11 @@ def check_existing_model():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-download TinyLlama into the local model cache")
+    parser.add_argument("--consolidate", action="store_true",
+                        help="merge sharded safetensors weights into a single file (used by offline loads only)")
+    args = parser.parse_args()
+
     print("\n")
     
     # Check if model already exists
@@ -178,7 +338,7 @@ if __name__ == "__main__":
         sys.exit(0)
     
     # Download model
-    success = download_model_with_progress()
+    success = download_model_with_progress(consolidate=args.consolidate)
     
     if success:
         sys.exit(0)
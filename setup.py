@@ -15,8 +15,16 @@ setup(
         "pydantic>=2.5.0",
         "python-dotenv>=1.0.0",
         "openai==0.28.0",
+        "orjson>=3.9.0",
+        "motor>=3.3.0",
+        "numpy>=1.25.0",
+        "scipy>=1.11.0",
         "pytest>=7.4.3",
     ],
+    extras_require={
+        # Rust-backed concurrent model downloads (scripts/download_model.py)
+        "fast-download": ["hf_transfer>=0.1.4"],
+    },
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
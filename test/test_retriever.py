@@ -2,6 +2,8 @@
 Unit tests for BM25 Retriever
 """
 
+import os
+import tempfile
 import unittest
 from app.core.retriever import BM25Retriever
 
@@ -33,10 +35,81 @@ class TestBM25Retriever(unittest.TestCase):
         self.assertEqual(len(results), 2)
         self.assertIn("carbonara", results[0][0].lower())
     
+    def test_retrieve_batch(self):
+        """Test batched retrieval matches single-query retrieval"""
+        queries = ["pasta eggs", "biryani rice"]
+        results = self.retriever.retrieve_batch(queries, top_k=2)
+        self.assertEqual(results, [self.retriever.retrieve(q, top_k=2) for q in queries])
+        self.assertIn("carbonara", results[0][0][0].lower())
+        self.assertIn("biryani", results[1][0][0].lower())
+    
+    def test_calculate_bm25_score(self):
+        """Test single-document scoring matches scoring the whole corpus"""
+        tokens = self.retriever.tokenize("pasta eggs and rice rice")
+        scores = self.retriever.score_documents(tokens)
+        for doc_idx in range(len(self.test_docs)):
+            self.assertEqual(self.retriever.calculate_bm25_score(tokens, doc_idx), float(scores[doc_idx]))
+
     def test_empty_query(self):
         """Test empty query handling"""
         results = self.retriever.retrieve("", top_k=1)
         self.assertIsNotNone(results)
 
+    def test_top_k_ties(self):
+        """Test tied scores keep document order"""
+        results = self.retriever.retrieve("unknownword", top_k=2)
+        self.assertEqual([doc for doc, _ in results], self.test_docs[:2])
+
+    def test_zero_top_k(self):
+        """Test top_k=0 returns no results for a multi-term query"""
+        self.assertEqual(self.retriever.retrieve("pasta eggs", top_k=0), [])
+
+    def test_pruned_top_k_matches_exhaustive(self):
+        """Test MaxScore pruning keeps the exhaustive top-k"""
+        docs = [f"salt water recipe number {i}" for i in range(17)]
+        docs += ["saffron rice with salt", "saffron milk", "saffron salt water broth"]
+        retriever = BM25Retriever()
+        retriever.index_documents(docs)
+        tokens = retriever.tokenize("saffron salt water")
+
+        exhaustive = retriever.score_documents(tokens)
+        pruned = retriever.score_documents(tokens, top_k=2)
+        # Pruning triggered: documents out of reach kept partial scores
+        self.assertTrue((pruned < exhaustive).any())
+
+        top_idx = retriever.select_top_k(pruned, 2)
+        self.assertEqual(top_idx.tolist(), retriever.select_top_k(exhaustive, 2).tolist())
+        self.assertEqual(pruned[top_idx].tolist(), exhaustive[top_idx].tolist())
+
+    def test_index_cache(self):
+        """Test cached index reloads with identical scores"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            first = BM25Retriever(cache_dir=cache_dir)
+            first.index_documents(self.test_docs)
+            second = BM25Retriever(cache_dir=cache_dir)
+            second.index_documents(self.test_docs)
+            self.assertEqual(first.retrieve("rice spices"), second.retrieve("rice spices"))
+            self.assertEqual(second.token2id, first.token2id)
+
+    def test_index_cache_evicts_stale(self):
+        """Test caching a new corpus removes the previous corpus' index"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            BM25Retriever(cache_dir=cache_dir).index_documents(self.test_docs)
+            BM25Retriever(cache_dir=cache_dir).index_documents(self.test_docs[:2])
+            self.assertEqual(len([name for name in os.listdir(cache_dir) if name.startswith("bm25_")]), 1)
+
+    def test_index_cache_corrupt(self):
+        """Test a corrupt cached index is rebuilt and replaced"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            first = BM25Retriever(cache_dir=cache_dir)
+            first.index_documents(self.test_docs)
+            cache_path = first._cache_path(self.test_docs)
+            os.remove(os.path.join(cache_path, "idf.npy"))
+
+            second = BM25Retriever(cache_dir=cache_dir)
+            second.index_documents(self.test_docs)
+            self.assertEqual(second.retrieve("rice spices"), first.retrieve("rice spices"))
+            self.assertTrue(os.path.exists(os.path.join(cache_path, "idf.npy")))
+
 if __name__ == '__main__':
     unittest.main()    
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Unit tests for TextProcessor chunking
+"""
+
+import os
+import tempfile
+import unittest
+from app.utils.text_processor import TextProcessor
+
+class TestChunkText(unittest.TestCase):
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.processor = TextProcessor(chunk_size=30, overlap=10)
+
+    def test_overlap_tail(self):
+        """Test a new chunk starts with the trailing words of the previous one"""
+        chunks = self.processor.chunk_text("alpha beta gamma delta\n\nepsilon zeta eta")
+        self.assertEqual(chunks, ["alpha beta gamma delta", "delta\n\nepsilon zeta eta"])
+
+    def test_overlap_tail_mid_word_cut(self):
+        """Test a word cut in half by the tail window is not carried over"""
+        self.assertEqual(self.processor._overlap_tail("abcdefghij klm"), "klm")
+
+    def test_overlap_tail_wide_whitespace(self):
+        """Test the tail window grows when every word in it fits"""
+        self.assertEqual(self.processor._overlap_tail("alpha" + " " * 20 + "beta"), "alpha beta")
+
+    def test_no_overlap(self):
+        """Test overlap=0 carries nothing into the next chunk"""
+        processor = TextProcessor(chunk_size=30, overlap=0)
+        chunks = processor.chunk_text("alpha beta gamma delta\n\nepsilon zeta eta")
+        self.assertEqual(chunks, ["alpha beta gamma delta", "epsilon zeta eta"])
+
+    def test_long_paragraph(self):
+        """Test paragraphs over chunk_size are split by characters"""
+        processor = TextProcessor(chunk_size=20, overlap=5)
+        chunks = processor.chunk_text("short para\n\n" + "x" * 50 + "\n\nend")
+        self.assertEqual(chunks, ["short para", "x" * 20, "x" * 20, "x" * 20, "end"])
+
+    def test_iter_paragraphs_input(self):
+        """Test chunking streamed paragraphs matches chunking the whole string"""
+        text = "\n\n".join([
+            "Pasta carbonara\nwith eggs",
+            "Biryani requires rice and aromatic spices",
+            "y" * 45,
+            "Chocolate cake",
+            "needs cocoa powder and sugar",
+        ])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "recipes.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            streamed = self.processor.chunk_text(TextProcessor.iter_paragraphs(path))
+        self.assertEqual(streamed, self.processor.chunk_text(text))
+        self.assertGreater(len(streamed), 3)
+
+    def _assert_same_paragraphs(self, raw: bytes):
+        """Streamed file paragraphs and string paragraphs must match and chunk the same"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "recipes.txt")
+            with open(path, "wb") as f:
+                f.write(raw)
+            streamed = [p.strip() for p in TextProcessor.iter_paragraphs(path)]
+            chunked = self.processor.chunk_text(TextProcessor.iter_paragraphs(path))
+        text = raw.decode("utf-8")
+        self.assertEqual(streamed, [p.strip() for p in TextProcessor.split_paragraphs(text)])
+        self.assertEqual(chunked, self.processor.chunk_text(text))
+        return streamed
+
+    def test_iter_paragraphs_whitespace_separator(self):
+        """Test a whitespace-only line separates paragraphs on both paths"""
+        self.assertEqual(self._assert_same_paragraphs(b"alpha\n \t\nbeta"), ["alpha", "beta"])
+
+    def test_iter_paragraphs_crlf(self):
+        """Test CRLF line endings split paragraphs the same on both paths"""
+        self.assertEqual(
+            self._assert_same_paragraphs(b"alpha\r\nbeta\r\n\r\ngamma\r\n"),
+            ["alpha\r\nbeta", "gamma"]
+        )
+
+class TestCharChunking(unittest.TestCase):
+
+    def test_offsets(self):
+        """Test windows advance by chunk_size - overlap and the last one reaches the end"""
+        starts, ends = TextProcessor._char_chunk_offsets(50, 20, 5)
+        self.assertEqual(starts.tolist(), [0, 15, 30])
+        self.assertEqual(ends.tolist(), [20, 35, 50])
+
+    def test_offsets_short_text(self):
+        """Test a text shorter than chunk_size is a single window"""
+        starts, ends = TextProcessor._char_chunk_offsets(10, 20, 5)
+        self.assertEqual(starts.tolist(), [0])
+        self.assertEqual(ends.tolist(), [10])
+
+    def test_offsets_overlap_not_less_than_chunk_size(self):
+        """Test overlap >= chunk_size still advances one character per window"""
+        for overlap in (3, 10):
+            starts, ends = TextProcessor._char_chunk_offsets(5, 3, overlap)
+            self.assertEqual(starts.tolist(), [0, 1, 2])
+            self.assertEqual(ends.tolist(), [3, 4, 5])
+
+    def test_char_chunking(self):
+        """Test char_chunking slices the text at the computed offsets"""
+        processor = TextProcessor(chunk_size=4, overlap=4)
+        self.assertEqual(processor.char_chunking("abcdefgh"), ["abcd", "bcde", "cdef", "defg", "efgh"])
+        self.assertEqual(processor.char_chunking(""), [])
+
+if __name__ == '__main__':
+    unittest.main()